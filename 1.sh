@@ -34,10 +34,15 @@ else
     echo ">>> 未找到 requirements.txt，跳过依赖安装"
 fi
 
-# ===== 5. 后台运行 Python app.py =====
+# ===== 5. 后台运行 Python 应用（gunicorn 多进程） =====
 echo ">>> 后台运行 Python 应用..."
-nohup python3 app.py > app.log 2>&1 &
+if python3 -m gunicorn --version >/dev/null 2>&1; then
+    nohup python3 -m gunicorn -c gunicorn.conf.py app:app > app.log 2>&1 &
+else
+    echo ">>> 未找到 gunicorn，使用开发服务器启动"
+    nohup python3 app.py > app.log 2>&1 &
+fi
 
 echo "部署完成！日志在 app.log"
-echo "后台进程 PID: $!"echo "部署完成！日志在 app.log"
 echo "后台进程 PID: $!"
+echo "平滑重载：kill -HUP $!"
@@ -1,13 +1,46 @@
-from flask import Flask, render_template, request, redirect, url_for, g, jsonify, flash, send_file
+import click
+from flask import Flask, render_template, request, redirect, url_for, g, jsonify, flash, make_response, send_file
+from flask import has_app_context, before_render_template, template_rendered
 import sqlite3
 import os
 import json
-from datetime import datetime
-from werkzeug.utils import secure_filename
+import csv
+import io
+import base64
+import hashlib
+import secrets
+import threading
+import atexit
+import queue
+import time
+import bisect
+import math
+from collections import Counter, OrderedDict
+from concurrent.futures import Future
+from datetime import datetime, timezone
+from werkzeug.utils import secure_filename, safe_join
+from werkzeug.middleware.proxy_fix import ProxyFix
+import tempfile
+import asyncio
+import fcntl
+import socket
+import ssl
+from urllib.parse import urlsplit, urljoin, quote
 import shutil
+import zlib
+import gzip
+import mimetypes
+
+try:
+    import brotli  # 可选：静态资源的 Brotli 预压缩
+except ImportError:
+    brotli = None
 
 app = Flask(__name__)
 app.secret_key = 'your-secret-key-here'  # 添加secret_key用于flash消息
+# 部署在反向代理之后时设置 TRUST_PROXY=1，按 X-Forwarded-For 识别客户端 IP（用于搜索限流）
+if os.environ.get('TRUST_PROXY') == '1':
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1, x_proto=1)
 
 # 自定义表单
 FORM_CONFIG = {
@@ -50,214 +83,2325 @@ FORM_CONFIG = {
     }
 }
 
-# 本地 SQLite 数据库
-DATABASE = 'resources.db'
+# 本地 SQLite 数据库
+DATABASE = 'resources.db'
+
+# 分页大小
+PAGE_SIZE = 60
+ADMIN_PAGE_SIZE = 100
+
+# 资源显示顺序，键集分页依赖 id 作为最后的唯一排序键
+RESOURCE_ORDER = 'sort_order ASC, updated_at DESC, created_at DESC, id ASC'
+
+# 导出/导入数据库时的临时目录（None 为系统临时目录）和每次读写的块大小
+TEMP_DIR = None
+EXPORT_CHUNK_SIZE = 1024 * 1024
+
+# SQLite 数据库文件头
+SQLITE_HEADER = b'SQLite format 3\x00'
+
+# 备份存储：快照按内容哈希去重并 gzip 压缩，每次备份只额外写一个很小的清单文件
+BACKUP_DIR = os.environ.get('BACKUP_DIR', 'backups')
+BACKUP_KEEP_LAST = int(os.environ.get('BACKUP_KEEP_LAST', '10'))      # 无论时间都保留最近的 K 份（导入、重置前的备份不会被马上清理）
+BACKUP_KEEP_HOURLY = int(os.environ.get('BACKUP_KEEP_HOURLY', '24'))  # 保留最近 N 个小时各自最新的一份
+BACKUP_KEEP_DAILY = int(os.environ.get('BACKUP_KEEP_DAILY', '30'))    # 保留最近 M 天各自最新的一份
+BACKUP_INTERVAL = int(os.environ.get('BACKUP_INTERVAL', '0'))         # 定时备份间隔秒数，0 表示不启动
+BACKUP_LIST_SIZE = 50  # 管理页面显示的备份数
+
+# 批量导入每个事务写入的行数，以及最多报告的错误行数
+BULK_BATCH_SIZE = 1000
+BULK_MAX_ERRORS = 100
+
+# 管理页面批量操作一次最多处理的资源数
+BATCH_MAX_IDS = 2000
+
+# JSON 接口每页最多返回的资源数
+API_MAX_LIMIT = 100
+
+# 首页标签导航显示的标签数
+TAG_FACET_SIZE = 30
+
+# 相邻资源 sort_order 的间隔，拖拽排序时取前后两项的中间值，只需更新被移动的一行
+SORT_GAP = 1024
+# 相邻两项的排序值之差小于该值时才安排后台重排（小数中间值还能继续二分很多次）
+RENUMBER_MIN_GAP = 1e-6
+
+# 首页渲染缓存的最大条目数（主页各分页、标签筛选页和 JSON 接口列表，搜索结果另有缓存）
+PAGE_CACHE_SIZE = 256
+
+# 搜索结果缓存：按关键词（去掉首尾空白、忽略 ASCII 大小写）缓存，数据变化或超过有效期后失效
+SEARCH_CACHE_SIZE = 1024
+SEARCH_CACHE_TTL = 300
+# 搜索限流：每个客户端 IP 一个令牌桶，只有未命中缓存的搜索才消耗令牌（每个进程单独计数）
+SEARCH_RATE = float(os.environ.get('SEARCH_RATE', '2'))    # 每秒补充的令牌数，0 表示不限流
+SEARCH_BURST = int(os.environ.get('SEARCH_BURST', '20'))   # 令牌桶容量
+RATE_LIMIT_CLIENTS = 10000                                 # 最多跟踪的客户端数，超出时淘汰最久未访问的
+
+# 数据代数：每次写入后递增，缓存条目只在代数一致时有效
+_data_generation = 0
+_page_cache = OrderedDict()
+_page_cache_lock = threading.Lock()
+_search_cache = OrderedDict()
+_search_cache_lock = threading.Lock()
+_tag_facet_cache = (None, [])
+_notice_cache = (None, None)
+# 内存只读模型：首页列表、标签筛选和搜索直接读取进程内快照（环境变量 READ_MODEL=1 开启）
+READ_MODEL = os.environ.get('READ_MODEL') == '1'
+READ_MODEL_SEARCH_CACHE = 128  # 每个快照缓存的搜索结果数
+_snapshot = None
+_snapshot_lock = threading.Lock()
+
+# 静态发布：设置环境变量 PUBLISH_DIR 后，每次写入提交后在后台把首页和分页生成为静态文件
+PUBLISH_DIR = os.environ.get('PUBLISH_DIR')
+PUBLISH_DELAY = 2.0        # 写入后等待的秒数，期间的连续写入只发布一次
+PUBLISH_MAX_DELAY = 10.0   # 持续写入时最长等待秒数
+PUBLISH_KEEP = 3           # 保留的历史发布版本数
+_publish_lock = threading.Lock()
+_publish_state_lock = threading.Lock()
+_publish_timer = None
+_publish_first_request = None
+
+# 变更订阅（长轮询 / SSE）等待数据变化
+_change_condition = threading.Condition()
+
+# 检测跨进程写入的专用连接及其上次看到的 data_version
+_change_watcher = None
+_last_data_version = None
+_watcher_lock = threading.Lock()
+
+# 数据库结构是否已在本进程内迁移到最新版本
+_schema_ready = False
+
+# SQLite 连接参数：WAL 模式下读写互不阻塞
+SQLITE_PRAGMAS = (
+    'PRAGMA journal_mode = WAL',
+    'PRAGMA synchronous = NORMAL',
+    'PRAGMA cache_size = -16000',     # 页缓存约 16MB
+    'PRAGMA mmap_size = 268435456',   # 内存映射 256MB
+    'PRAGMA temp_store = MEMORY',
+    'PRAGMA busy_timeout = 5000',
+)
+POOL_SIZE = 8                  # 最多保留的空闲连接数
+STATEMENT_CACHE_SIZE = 256     # 每个连接缓存的预编译语句数
+
+# 慢请求日志阈值（毫秒），0 表示关闭；可用环境变量 SLOW_REQUEST_MS 设置
+SLOW_REQUEST_MS = float(os.environ.get('SLOW_REQUEST_MS', '0'))
+# 延迟直方图的分桶上界（秒）
+METRIC_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+# 多进程部署时各 worker 共享的指标目录（gunicorn.conf.py 会自动设置），未设置时只统计本进程
+METRICS_DIR = os.environ.get('METRICS_DIR') or None
+METRICS_FLUSH_INTERVAL = 5     # 每个进程把指标写入共享目录的间隔（秒）
+
+class Metrics:
+    """进程内的计数器和直方图，按 Prometheus 文本格式输出
+
+    设置了共享目录时，每个进程定期把自己的数据写到目录中的一个文件，
+    输出时合并所有进程的文件；已退出进程的数据并入 archive.json，计数不会因换 worker 而回退。
+    """
+
+    def __init__(self, buckets, directory=None):
+        self.buckets = buckets
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._counters = {}    # (指标名, 标签) -> 值
+        self._histograms = {}  # (指标名, 标签) -> [各分桶计数..., 总和, 次数]
+        self._help = {}
+        self._flusher = None
+        self._flusher_pid = None
+
+    def describe(self, name, kind, text):
+        self._help[name] = (kind, text)
+
+    def inc(self, name, labels, value=1):
+        with self._lock:
+            key = (name, labels)
+            self._counters[key] = self._counters.get(key, 0) + value
+        self._start_flusher()
+
+    def observe(self, name, labels, value):
+        with self._lock:
+            data = self._histograms.setdefault((name, labels), [0] * (len(self.buckets) + 2))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    data[i] += 1
+            data[-2] += value
+            data[-1] += 1
+        self._start_flusher()
+
+    def _start_flusher(self):
+        """首次记录时启动定期写文件的后台线程（fork 后的子进程会重新启动）"""
+        if self.directory is None or self._flusher_pid == os.getpid():
+            return
+        with self._lock:
+            if self._flusher_pid == os.getpid():
+                return
+            self._flusher_pid = os.getpid()
+            # 文件名带随机后缀，pid 被复用时不会覆盖已退出进程留下的数据
+            self._path = os.path.join(self.directory, f'{os.getpid()}-{secrets.token_hex(4)}.json')
+            self._flusher = threading.Thread(target=self._flush_loop, name='metrics-flush', daemon=True)
+            self._flusher.start()
+        atexit.register(self.flush)
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(METRICS_FLUSH_INTERVAL)
+            self.flush()
+
+    def _snapshot(self):
+        with self._lock:
+            return dict(self._counters), {key: list(data) for key, data in self._histograms.items()}
+
+    def flush(self):
+        """把本进程的数据写入共享目录（先写临时文件再替换，读取方不会读到半个文件）"""
+        if self.directory is None or self._flusher_pid != os.getpid():
+            return
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            self._dump(self._path, *self._snapshot())
+        except OSError as e:
+            print(f"写入指标文件错误: {e}")
+
+    @staticmethod
+    def _dump(path, counters, histograms):
+        # JSON 没有元组，标签存成 [[键, 值], ...]
+        payload = {
+            'counters': [[name, [list(pair) for pair in labels], value] for (name, labels), value in counters.items()],
+            'histograms': [[name, [list(pair) for pair in labels], data] for (name, labels), data in histograms.items()],
+        }
+        tmp = path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(payload, f)
+        os.replace(tmp, path)
+
+    @staticmethod
+    def _load(path):
+        with open(path) as f:
+            payload = json.load(f)
+        counters = {(name, tuple(tuple(pair) for pair in labels)): value for name, labels, value in payload['counters']}
+        histograms = {(name, tuple(tuple(pair) for pair in labels)): data for name, labels, data in payload['histograms']}
+        return counters, histograms
+
+    @staticmethod
+    def _merge(into, counters, histograms):
+        for key, value in counters.items():
+            into[0][key] = into[0].get(key, 0) + value
+        for key, data in histograms.items():
+            total = into[1].get(key)
+            into[1][key] = list(data) if total is None else [a + b for a, b in zip(total, data)]
+
+    @staticmethod
+    def _alive(pid):
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        return True
+
+    def collect(self):
+        """返回 (计数器, 直方图)：有共享目录时为所有进程之和，否则为本进程的数据"""
+        if self.directory is None:
+            return self._snapshot()
+        self._start_flusher()
+        self.flush()
+        merged = ({}, {})
+        archive = os.path.join(self.directory, 'archive.json')
+        # 归档已退出进程的文件时加锁，避免两个 worker 同时抓取时重复计入
+        with open(os.path.join(self.directory, 'archive.lock'), 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            archived = ({}, {})
+            if os.path.exists(archive):
+                self._merge(archived, *self._load(archive))
+            dead = []
+            for filename in os.listdir(self.directory):
+                pid, _, suffix = filename.partition('-')
+                if not pid.isdigit() or not suffix.endswith('.json'):
+                    continue
+                path = os.path.join(self.directory, filename)
+                try:
+                    data = self._load(path)
+                except (OSError, ValueError) as e:
+                    print(f"读取指标文件错误: {e}")
+                    continue
+                if self._alive(int(pid)):
+                    self._merge(merged, *data)
+                else:
+                    self._merge(archived, *data)
+                    dead.append(path)
+            if dead:
+                self._dump(archive, *archived)
+                for path in dead:
+                    os.remove(path)
+        self._merge(merged, *archived)
+        return merged
+
+    def render(self):
+        def fmt(labels, extra=()):
+            pairs = list(labels) + list(extra)
+            if not pairs:
+                return ''
+            return '{' + ','.join('%s="%s"' % (k, str(v).replace('\\', '\\\\').replace('"', '\\"')) for k, v in pairs) + '}'
+
+        counters, histograms = self.collect()
+        counters = sorted(counters.items())
+        histograms = sorted(histograms.items())
+        lines = []
+        described = set()
+        for (name, labels), value in counters:
+            if name not in described and name in self._help:
+                described.add(name)
+                lines.append(f'# HELP {name} {self._help[name][1]}')
+                lines.append(f'# TYPE {name} counter')
+            lines.append(f'{name}{fmt(labels)} {value}')
+        for (name, labels), data in histograms:
+            if name not in described and name in self._help:
+                described.add(name)
+                lines.append(f'# HELP {name} {self._help[name][1]}')
+                lines.append(f'# TYPE {name} histogram')
+            for bound, count in zip(self.buckets, data):
+                lines.append(f'{name}_bucket{fmt(labels, [("le", bound)])} {count}')
+            lines.append(f'{name}_bucket{fmt(labels, [("le", "+Inf")])} {data[-1]}')
+            lines.append(f'{name}_sum{fmt(labels)} {data[-2]:.6f}')
+            lines.append(f'{name}_count{fmt(labels)} {data[-1]}')
+        return '\n'.join(lines) + '\n'
+
+metrics = Metrics(METRIC_BUCKETS, METRICS_DIR)
+metrics.describe('jb_requests_total', 'counter', '请求数')
+metrics.describe('jb_sql_statements_total', 'counter', 'SQL 语句数')
+metrics.describe('jb_request_duration_seconds', 'histogram', '请求总耗时')
+metrics.describe('jb_request_sql_seconds', 'histogram', '每个请求的 SQL 总耗时')
+metrics.describe('jb_request_sql_statements', 'histogram', '每个请求执行的 SQL 语句数')
+metrics.describe('jb_template_render_seconds', 'histogram', '模板渲染耗时')
+metrics.describe('jb_search_cache_total', 'counter', '搜索缓存命中 / 未命中次数')
+metrics.describe('jb_search_rate_limited_total', 'counter', '因限流被拒绝的搜索数')
+
+def record_query(sql, elapsed):
+    """把一条 SQL 的耗时累加到当前请求的统计中"""
+    if not has_app_context():
+        return
+    stats = g.get('_request_stats')
+    if stats is None:
+        return
+    stats['sql_count'] += 1
+    stats['sql_time'] += elapsed
+    if elapsed > stats['slowest_time']:
+        stats['slowest_time'] = elapsed
+        stats['slowest_sql'] = ' '.join(sql.split())[:200]
+
+class InstrumentedConnection(sqlite3.Connection):
+    """记录每条 SQL 执行耗时的连接
+
+    execute 只包含第一步执行，fetchall 取剩余行的时间不计入。
+    """
+
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            record_query(sql, time.perf_counter() - start)
+
+    def executemany(self, sql, seq_of_parameters):
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            record_query(sql, time.perf_counter() - start)
+
+class ConnectionPool:
+    """SQLite 长连接池
+
+    连接在请求结束后归还并被下一个请求复用，同一时间只属于一个线程。
+    导入/重置数据库通过在线备份 API 写入现有文件，不替换文件，因此连接无需关闭重开。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._idle = []
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, cached_statements=STATEMENT_CACHE_SIZE, check_same_thread=False,
+                               factory=InstrumentedConnection)
+        conn.row_factory = sqlite3.Row
+        for pragma in SQLITE_PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def acquire(self):
+        """借出一个连接，没有空闲连接时新建"""
+        with self._lock:
+            conn = self._idle.pop() if self._idle else None
+        return conn or self._connect()
+
+    def release(self, conn):
+        """归还连接，丢弃未提交的事务"""
+        if conn.in_transaction:
+            try:
+                conn.rollback()
+            except sqlite3.Error:
+                conn.close()
+                return
+        with self._lock:
+            if len(self._idle) < POOL_SIZE:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+db_pool = ConnectionPool(DATABASE)
+
+WRITE_BATCH_SIZE = 64      # 写线程一个事务最多合并的写操作数
+WRITE_TIMEOUT = 30         # 请求等待写操作完成的最长秒数
+
+class WriteQueue:
+    """单写线程
+
+    所有修改操作排队后在同一个线程、同一个连接上串行执行，不再由多个请求线程争抢写锁。
+    排队中的多个操作合并为一个事务提交，每个操作用 SAVEPOINT 隔离，单个失败只回滚它自己。
+    读请求仍走连接池，WAL 模式下不会被写入阻塞。
+    """
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def submit(self, func, *args):
+        """提交写操作，返回 Future。func(db, *args) 在写线程中执行，不要自行提交事务"""
+        future = Future()
+        with self._lock:
+            # 延迟到首次写入时启动，gunicorn fork 出的每个 worker 各有一个写线程
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='db-writer', daemon=True)
+                self._thread.start()
+        self._queue.put((func, args, future))
+        return future
+
+    def run(self, func, *args):
+        """提交写操作并等待结果，操作抛出的异常原样抛给调用方"""
+        return self.submit(func, *args).result(WRITE_TIMEOUT)
+
+    def _run(self):
+        if not _schema_ready:
+            init_db()
+        conn = db_pool._connect()
+        conn.isolation_level = None  # 事务由写线程显式管理
+        while True:
+            jobs = [self._queue.get()]
+            while len(jobs) < WRITE_BATCH_SIZE:
+                try:
+                    jobs.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._execute(conn, jobs)
+
+    def _execute(self, conn, jobs):
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+        except sqlite3.Error as e:
+            print(f"写线程开始事务错误: {e}")
+            for _, _, future in jobs:
+                future.set_exception(e)
+            return
+
+        done = []
+        for func, args, future in jobs:
+            conn.execute('SAVEPOINT write_job')
+            try:
+                result = func(conn, *args)
+                conn.execute('RELEASE write_job')
+                done.append((future, result))
+            except Exception as e:
+                if conn.in_transaction:
+                    conn.execute('ROLLBACK TO write_job')
+                    conn.execute('RELEASE write_job')
+                future.set_exception(e)
+
+        try:
+            if conn.in_transaction:
+                conn.execute('COMMIT')
+        except sqlite3.Error as e:
+            print(f"写线程提交事务错误: {e}")
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            for future, _ in done:
+                future.set_exception(e)
+            return
+
+        if done:
+            bump_generation()
+            schedule_publish()
+        for future, result in done:
+            future.set_result(result)
+
+write_queue = WriteQueue()
+
+def get_db():
+    """获取数据库连接（从连接池借出，请求结束时归还）"""
+    db = getattr(g, '_database', None)
+    if db is None:
+        if not _schema_ready:
+            init_db()  # 进程内首次访问时执行数据库迁移
+        db = g._database = db_pool.acquire()
+    return db
+
+@app.teardown_appcontext
+def close_connection(exception):
+    """归还数据库连接"""
+    release_db()
+
+@app.before_request
+def start_request_stats():
+    """开始统计本次请求"""
+    g._request_stats = {
+        'start': time.perf_counter(),
+        'sql_count': 0, 'sql_time': 0.0,
+        'slowest_sql': None, 'slowest_time': 0.0,
+        'template_time': 0.0, 'template_starts': [],
+    }
+
+@app.after_request
+def finish_request_stats(response):
+    """记录请求耗时、SQL 统计，超过阈值时输出慢请求日志"""
+    stats = g.get('_request_stats')
+    if stats is None:
+        return response
+    elapsed = time.perf_counter() - stats['start']
+    endpoint = (('endpoint', request.endpoint or 'unmatched'),)
+
+    metrics.inc('jb_requests_total', endpoint + (('method', request.method), ('status', response.status_code)))
+    metrics.inc('jb_sql_statements_total', endpoint, stats['sql_count'])
+    metrics.observe('jb_request_duration_seconds', endpoint, elapsed)
+    metrics.observe('jb_request_sql_seconds', endpoint, stats['sql_time'])
+    metrics.observe('jb_request_sql_statements', endpoint, stats['sql_count'])
+
+    if SLOW_REQUEST_MS and elapsed * 1000 >= SLOW_REQUEST_MS:
+        print(f"慢请求: {request.method} {request.full_path.rstrip('?')} {response.status_code} "
+              f"总耗时 {elapsed * 1000:.1f}ms, SQL {stats['sql_count']} 条 {stats['sql_time'] * 1000:.1f}ms, "
+              f"模板 {stats['template_time'] * 1000:.1f}ms, "
+              f"最慢 SQL {stats['slowest_time'] * 1000:.1f}ms: {stats['slowest_sql']}")
+    return response
+
+def template_started(sender, template, context, **extra):
+    stats = g.get('_request_stats')
+    if stats is not None:
+        stats['template_starts'].append(time.perf_counter())
+
+def template_finished(sender, template, context, **extra):
+    stats = g.get('_request_stats')
+    if stats is None or not stats['template_starts']:
+        return
+    elapsed = time.perf_counter() - stats['template_starts'].pop()
+    stats['template_time'] += elapsed
+    metrics.observe('jb_template_render_seconds', (('template', template.name),), elapsed)
+
+before_render_template.connect(template_started, app)
+template_rendered.connect(template_finished, app)
+
+def release_db():
+    """提前归还当前请求的数据库连接"""
+    db = getattr(g, '_database', None)
+    if db is not None:
+        g._database = None
+        try:
+            db_pool.release(db)
+        except:
+            pass
+
+def migrate_base_tables(db):
+    """迁移 1：资源表、公告表及旧版本数据库缺失的列"""
+    # 创建资源表
+    db.execute('''  
+        CREATE TABLE IF NOT EXISTS resources (  
+            id INTEGER PRIMARY KEY AUTOINCREMENT,  
+            name TEXT NOT NULL,  
+            r_type TEXT,  
+            description TEXT,  
+            tg_link TEXT,  
+            pan_link TEXT,  
+            pan_pass TEXT,  
+            tags TEXT,  
+            sort_order INTEGER DEFAULT 0,  
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,  
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP  
+        )  
+    ''')  
+      
+    # 创建公告表  
+    db.execute('''  
+        CREATE TABLE IF NOT EXISTS notices (  
+            id INTEGER PRIMARY KEY AUTOINCREMENT,  
+            content TEXT NOT NULL,  
+            is_enabled INTEGER DEFAULT 0,  
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,  
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP  
+        )  
+    ''')  
+      
+    # 没有公告数据则初始化一条默认公告  
+    db.execute('''  
+        INSERT INTO notices (content, is_enabled)   
+        SELECT '欢迎使用资源分享站！', 0 WHERE NOT EXISTS (SELECT 1 FROM notices)
+    ''')  
+          
+    # 旧版本数据库可能缺少 sort_order / updated_at 列  
+    columns = [column[1] for column in db.execute("PRAGMA table_info(resources)")]  
+    if 'sort_order' not in columns:  
+        db.execute("ALTER TABLE resources ADD COLUMN sort_order INTEGER DEFAULT 0")  
+        # 为现有数据按创建时间倒序设置排序
+        renumber_sort_order(db, 'created_at DESC, id DESC', step=1)
+    if 'updated_at' not in columns:  
+        db.execute("ALTER TABLE resources ADD COLUMN updated_at TIMESTAMP")  
+    db.execute("UPDATE resources SET updated_at = CURRENT_TIMESTAMP WHERE updated_at IS NULL")
+
+def migrate_order_index(db):
+    """迁移 2：键集分页使用的排序索引"""
+    db.execute('''
+        CREATE INDEX IF NOT EXISTS idx_resources_order
+        ON resources (sort_order ASC, updated_at DESC, created_at DESC, id ASC)
+    ''')
+
+def migrate_fts(db):
+    """迁移 3：资源全文索引（FTS5 + trigram 分词，支持中文子串搜索）"""
+    try:
+        db.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS resources_fts USING fts5(
+                name, tags, description,
+                content='resources', content_rowid='id',
+                tokenize='trigram'
+            )
+        ''')
+    except sqlite3.Error as e:
+        # 旧版 SQLite 不支持 trigram 分词，搜索回退到 LIKE 查询
+        print(f"创建全文索引失败，搜索将使用 LIKE 查询: {e}")
+        return
+
+    # 触发器保持索引与 resources 表同步
+    db.execute('''
+        CREATE TRIGGER IF NOT EXISTS resources_fts_ai AFTER INSERT ON resources BEGIN
+            INSERT INTO resources_fts (rowid, name, tags, description)
+            VALUES (new.id, new.name, new.tags, new.description);
+        END
+    ''')
+    db.execute('''
+        CREATE TRIGGER IF NOT EXISTS resources_fts_ad AFTER DELETE ON resources BEGIN
+            INSERT INTO resources_fts (resources_fts, rowid, name, tags, description)
+            VALUES ('delete', old.id, old.name, old.tags, old.description);
+        END
+    ''')
+    db.execute('''
+        CREATE TRIGGER IF NOT EXISTS resources_fts_au AFTER UPDATE OF name, tags, description ON resources BEGIN
+            INSERT INTO resources_fts (resources_fts, rowid, name, tags, description)
+            VALUES ('delete', old.id, old.name, old.tags, old.description);
+            INSERT INTO resources_fts (rowid, name, tags, description)
+            VALUES (new.id, new.name, new.tags, new.description);
+        END
+    ''')
+
+    # 为已有数据建立索引
+    db.execute("INSERT INTO resources_fts (resources_fts) VALUES ('rebuild')")
+
+def migrate_sort_gaps(db):
+    """迁移 4：按当前显示顺序把 sort_order 重排为等间隔的值"""
+    renumber_sort_order(db, RESOURCE_ORDER, SORT_GAP)
+
+def migrate_tags(db):
+    """迁移 5：规范化的标签表及资源-标签关联表"""
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS tags (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL UNIQUE
+        )
+    ''')
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS resource_tags (
+            tag_id INTEGER NOT NULL,
+            resource_id INTEGER NOT NULL,
+            PRIMARY KEY (tag_id, resource_id)
+        ) WITHOUT ROWID
+    ''')
+    db.execute('CREATE INDEX IF NOT EXISTS idx_resource_tags_resource ON resource_tags (resource_id)')
+
+    # 删除资源时同步删除标签关联
+    db.execute('''
+        CREATE TRIGGER IF NOT EXISTS resources_tags_ad AFTER DELETE ON resources BEGIN
+            DELETE FROM resource_tags WHERE resource_id = old.id;
+        END
+    ''')
+    rebuild_tag_index(db)
+
+def migrate_pan_link_index(db):
+    """迁移 6：批量导入按下载链接去重使用的索引"""
+    db.execute('CREATE INDEX IF NOT EXISTS idx_resources_pan_link ON resources (pan_link)')
+
+def migrate_notice_indexes(db):
+    """迁移 7：公告查询使用的索引（当前公告 / 当前启用的公告）"""
+    db.execute('CREATE INDEX IF NOT EXISTS idx_notices_updated ON notices (updated_at)')
+    db.execute('CREATE INDEX IF NOT EXISTS idx_notices_enabled ON notices (is_enabled, updated_at)')
+
+def migrate_change_feed(db):
+    """迁移 8：资源变更日志（单调序号 + 删除墓碑），由触发器在所有写入路径上记录
+
+    每个资源只保留最新的一条记录，日志大小约等于资源数加已删除资源数。
+    feed_state.epoch 标识日志所属的数据库，整库导入/重置后改变，旧游标随之失效。
+    """
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS resource_changes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            resource_id INTEGER NOT NULL,
+            op TEXT NOT NULL,
+            changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    db.execute('CREATE INDEX IF NOT EXISTS idx_resource_changes_resource ON resource_changes (resource_id)')
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS feed_state (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            epoch TEXT NOT NULL
+        )
+    ''')
+    db.execute('INSERT OR IGNORE INTO feed_state (id, epoch) VALUES (1, ?)', (secrets.token_hex(8),))
+
+    db.execute('''
+        CREATE TRIGGER IF NOT EXISTS resources_changes_ai AFTER INSERT ON resources BEGIN
+            DELETE FROM resource_changes WHERE resource_id = new.id;
+            INSERT INTO resource_changes (resource_id, op) VALUES (new.id, 'upsert');
+        END
+    ''')
+    db.execute('''
+        CREATE TRIGGER IF NOT EXISTS resources_changes_au
+        AFTER UPDATE OF name, r_type, description, tg_link, pan_link, pan_pass, tags, sort_order ON resources BEGIN
+            DELETE FROM resource_changes WHERE resource_id = new.id;
+            INSERT INTO resource_changes (resource_id, op) VALUES (new.id, 'upsert');
+        END
+    ''')
+    db.execute('''
+        CREATE TRIGGER IF NOT EXISTS resources_changes_ad AFTER DELETE ON resources BEGIN
+            DELETE FROM resource_changes WHERE resource_id = old.id;
+            INSERT INTO resource_changes (resource_id, op) VALUES (old.id, 'delete');
+        END
+    ''')
+
+    # 已有资源按显示顺序记录一次
+    db.execute(f'''
+        INSERT INTO resource_changes (resource_id, op)
+        SELECT id, 'upsert' FROM resources
+        WHERE id NOT IN (SELECT resource_id FROM resource_changes)
+        ORDER BY {RESOURCE_ORDER}
+    ''')
+
+def migrate_link_status(db):
+    """迁移 9：链接检查结果列（不在变更日志和全文索引触发器的监听列中）"""
+    columns = [row[1] for row in db.execute('PRAGMA table_info(resources)')]
+    for column, kind in (('pan_link_status', 'TEXT'), ('tg_link_status', 'TEXT'), ('link_checked_at', 'TIMESTAMP')):
+        if column not in columns:
+            db.execute(f'ALTER TABLE resources ADD COLUMN {column} {kind}')
+    db.execute('CREATE INDEX IF NOT EXISTS idx_resources_link_checked ON resources (link_checked_at)')
+
+# 数据库迁移列表，第 N 项执行后 PRAGMA user_version = N。
+# 只能在末尾追加新迁移，已发布的迁移不要修改。
+MIGRATIONS = [
+    migrate_base_tables,
+    migrate_order_index,
+    migrate_fts,
+    migrate_sort_gaps,
+    migrate_tags,
+    migrate_pan_link_index,
+    migrate_notice_indexes,
+    migrate_change_feed,
+    migrate_link_status,
+]
+
+def renumber_sort_order(db, order_by, step):
+    """按给定顺序批量重排 sort_order（基于窗口函数的集合操作）"""
+    db.execute('CREATE TEMP TABLE IF NOT EXISTS sort_renumber (id INTEGER PRIMARY KEY, new_order INTEGER)')
+    db.execute('DELETE FROM sort_renumber')
+    db.execute(f'''
+        INSERT INTO sort_renumber (id, new_order)
+        SELECT id, ROW_NUMBER() OVER (ORDER BY {order_by}) * ? FROM resources
+    ''', (step,))
+    # 只改写排序值实际变化的行，未变化的行不会触发变更日志
+    db.execute('''
+        UPDATE resources SET sort_order = (
+            SELECT new_order FROM sort_renumber WHERE sort_renumber.id = resources.id
+        )
+        WHERE sort_order IS NOT (SELECT new_order FROM sort_renumber WHERE sort_renumber.id = resources.id)
+    ''')
+    db.execute('DELETE FROM sort_renumber')
+
+def split_tags(text):
+    """拆分标签文本（支持中英文逗号），去掉空白和重复项"""
+    tags = []
+    for part in (text or '').replace('，', ',').split(','):
+        tag = part.strip()
+        if tag and tag not in tags:
+            tags.append(tag)
+    return tags
+
+def sync_resource_tags(db, resource_id, tags_text):
+    """资源新增或修改后同步标签关联"""
+    names = split_tags(tags_text)
+    db.execute('DELETE FROM resource_tags WHERE resource_id = ?', (resource_id,))
+    db.executemany('INSERT OR IGNORE INTO tags (name) VALUES (?)', [(name,) for name in names])
+    db.executemany(
+        'INSERT OR IGNORE INTO resource_tags (tag_id, resource_id) SELECT id, ? FROM tags WHERE name = ?',
+        [(resource_id, name) for name in names]
+    )
+
+def rebuild_tag_index(db):
+    """根据 resources.tags 重建全部标签关联（迁移和导入数据库时使用）"""
+    pairs = []
+    names = set()
+    for row in db.execute('SELECT id, tags FROM resources'):
+        for name in split_tags(row[1]):
+            pairs.append((row[0], name))
+            names.add(name)
+    db.execute('DELETE FROM resource_tags')
+    db.executemany('INSERT OR IGNORE INTO tags (name) VALUES (?)', [(name,) for name in names])
+    db.executemany(
+        'INSERT OR IGNORE INTO resource_tags (tag_id, resource_id) SELECT id, ? FROM tags WHERE name = ?',
+        pairs
+    )
+    db.execute('DELETE FROM tags WHERE id NOT IN (SELECT tag_id FROM resource_tags)')
+
+def with_tag_lists(rows):
+    """为模板准备资源数据，附带拆分好的标签列表"""
+    resources = []
+    for row in rows:
+        item = dict(row)
+        item['tag_list'] = split_tags(item.get('tags'))
+        resources.append(item)
+    return resources
+
+def get_tag_facets(db):
+    """首页标签导航：按资源数排序的热门标签（按数据代数缓存）"""
+    global _tag_facet_cache
+    generation = _data_generation
+    cached_generation, facets = _tag_facet_cache
+    if cached_generation == generation:
+        return facets
+    facets = db.execute('''
+        SELECT t.name, COUNT(*) AS count FROM resource_tags rt
+        JOIN tags t ON t.id = rt.tag_id
+        GROUP BY rt.tag_id ORDER BY count DESC, t.name LIMIT ?
+    ''', (TAG_FACET_SIZE,)).fetchall()
+    facets = [{'name': row['name'], 'count': row['count']} for row in facets]
+    _tag_facet_cache = (generation, facets)
+    return facets
+
+def rank_between(db, item_id, before_id, after_id):
+    """计算资源移动到 before_id 之后（或 after_id 之前）时的新 sort_order
+
+    返回 (新排序值, 是否需要重排)；整数间隔用尽时返回小数，间隔小到接近精度极限时才由后台任务重新拉开间隔。
+    """
+    def scalar(sql, params):
+        row = db.execute(sql, params).fetchone()
+        return row[0] if row else None
+
+    if before_id is not None:
+        prev_order = scalar('SELECT sort_order FROM resources WHERE id = ?', (before_id,))
+        if prev_order is None:
+            return None, False
+        next_order = scalar('SELECT MIN(sort_order) FROM resources WHERE sort_order > ? AND id != ?', (prev_order, item_id))
+    elif after_id is not None:
+        next_order = scalar('SELECT sort_order FROM resources WHERE id = ?', (after_id,))
+        if next_order is None:
+            return None, False
+        prev_order = scalar('SELECT MAX(sort_order) FROM resources WHERE sort_order < ? AND id != ?', (next_order, item_id))
+    else:
+        return None, False
+
+    if prev_order is None:
+        return next_order - SORT_GAP, False
+    if next_order is None:
+        return prev_order + SORT_GAP, False
+    if isinstance(prev_order, int) and isinstance(next_order, int) and next_order - prev_order >= 2:
+        return (prev_order + next_order) // 2, False
+    middle = (prev_order + next_order) / 2
+    if not prev_order < middle < next_order:
+        # 小数精度也已用尽，同步重排后重新计算
+        renumber_sort_order(db, RESOURCE_ORDER, SORT_GAP)
+        return rank_between(db, item_id, before_id, after_id)
+    return middle, next_order - prev_order < RENUMBER_MIN_GAP
+
+_renumber_lock = threading.Lock()
+_renumber_pending = False
+
+def schedule_renumber():
+    """在写线程中重新拉开 sort_order 间隔（同一时间只排队一次，不等待结果）"""
+    global _renumber_pending
+    with _renumber_lock:
+        if _renumber_pending:
+            return
+        _renumber_pending = True
+    write_queue.submit(background_renumber).add_done_callback(report_renumber)
+
+def background_renumber(db):
+    """后台重排任务"""
+    global _renumber_pending
+    with _renumber_lock:
+        _renumber_pending = False
+    renumber_sort_order(db, RESOURCE_ORDER, SORT_GAP)
+
+def report_renumber(future):
+    if future.exception():
+        print(f"后台重排错误: {future.exception()}")
+    else:
+        print("排序间隔已重新分配")
+
+def migrate_db(db):
+    """执行所有未应用的迁移，每个迁移在单独的事务中完成
+
+    版本号在写锁内读取，多个 worker 同时启动时每个迁移只会执行一次。
+    """
+    while True:
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            version = db.execute('PRAGMA user_version').fetchone()[0]
+            if version >= len(MIGRATIONS):
+                db.execute('COMMIT')
+                return
+            migration = MIGRATIONS[version]
+            migration(db)
+            db.execute(f'PRAGMA user_version = {version + 1}')
+            db.execute('COMMIT')
+        except Exception:
+            db.execute('ROLLBACK')
+            raise
+        print(f"数据库迁移到版本 {version + 1}: {migration.__doc__.splitlines()[0]}")
+
+def init_db():
+    """初始化数据库 - 启动时以及导入/重置数据库后执行迁移"""
+    global _schema_ready
+    try:
+        db = sqlite3.connect(DATABASE, isolation_level=None)
+        try:
+            migrate_db(db)
+        finally:
+            db.close()
+        _schema_ready = True
+        bump_generation()
+        print("数据库初始化完成")
+            
+    except Exception as e:
+        print(f"数据库初始化错误: {e}")
+
+def encode_cursor(values):
+    """将分页游标编码为 URL 安全的字符串"""
+    raw = json.dumps(values, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+# 游标各元素允许的类型
+NUMBER = (int, float)
+TEXT = (str, type(None))
+ORDER_CURSOR = (NUMBER, TEXT, TEXT, (int,))   # (sort_order, updated_at, created_at, id)
+SCORE_CURSOR = (NUMBER, (int,))               # 全文搜索 (相关度, id)
+POSITION_CURSOR = ((int,), (int,))            # 内存快照搜索 (匹配级别, 显示位置)
+FEED_CURSOR = ((str,), (int,))                # 变更订阅 (epoch, seq)
+
+def cursor_value_ok(value, kinds):
+    if isinstance(value, bool) or not isinstance(value, kinds):
+        return False
+    return not isinstance(value, float) or math.isfinite(value)
+
+def decode_cursor(token, kinds):
+    """解析分页游标并检查每个元素的类型，无效游标返回 None（即从第一页开始）"""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        values = json.loads(raw.decode('utf-8'))
+        if (isinstance(values, list) and len(values) == len(kinds)
+                and all(cursor_value_ok(value, kind) for value, kind in zip(values, kinds))):
+            return values
+    except (ValueError, UnicodeDecodeError):
+        pass
+    return None
+
+def order_cursor(row):
+    """根据最后一行生成列表排序游标"""
+    return encode_cursor([row['sort_order'], row['updated_at'], row['created_at'], row['id']])
+
+def order_keyset(cursor, prefix=''):
+    """生成 (sort_order, updated_at, created_at, id) 键集分页的 WHERE 条件
+
+    排序为 sort_order ASC, updated_at DESC, created_at DESC, id ASC，
+    额外的 sort_order >= ? 条件让 SQLite 可以直接在索引上定位，深分页和第一页开销相同。
+    """
+    if cursor is None:
+        return '1', ()
+    sort_order, updated_at, created_at, item_id = cursor
+    sql = f'''{prefix}sort_order >= ? AND (
+        {prefix}sort_order > ? OR ({prefix}sort_order = ? AND (
+            {prefix}updated_at < ? OR ({prefix}updated_at = ? AND (
+                {prefix}created_at < ? OR ({prefix}created_at = ? AND {prefix}id > ?)
+            ))
+        ))
+    )'''
+    params = (sort_order, sort_order, sort_order, updated_at, updated_at, created_at, created_at, item_id)
+    return sql, params
+
+def list_resources(db, cursor=None, limit=PAGE_SIZE, tag=None):
+    """按显示顺序分页获取资源（可按标签筛选），返回 (资源列表, 下一页游标)"""
+    where, params = order_keyset(decode_cursor(cursor, ORDER_CURSOR))
+    if tag:
+        where = f'''id IN (
+            SELECT rt.resource_id FROM resource_tags rt JOIN tags t ON t.id = rt.tag_id WHERE t.name = ?
+        ) AND {where}'''
+        params = (tag,) + params
+    rows = db.execute(f'''
+        SELECT * FROM resources WHERE {where}
+        ORDER BY {RESOURCE_ORDER} LIMIT ?
+    ''', params + (limit + 1,)).fetchall()
+    if len(rows) > limit:
+        return rows[:limit], order_cursor(rows[limit - 1])
+    return rows, None
+
+def count_tag_resources(db, tag):
+    """统计某个标签下的资源数"""
+    return db.execute('''
+        SELECT COUNT(*) FROM resource_tags rt JOIN tags t ON t.id = rt.tag_id WHERE t.name = ?
+    ''', (tag,)).fetchone()[0]
+
+def fts_phrase(query):
+    """将搜索词转换为 FTS5 短语查询"""
+    return '"' + query.replace('"', '""') + '"'
+
+def search_resources(db, query, cursor=None, limit=PAGE_SIZE):
+    """搜索资源 - 优先使用全文索引并按相关度排序，返回 (资源列表, 下一页游标)"""
+    # trigram 分词至少需要 3 个字符，更短的关键词回退到 LIKE 查询
+    if len(query) >= 3:
+        try:
+            after = decode_cursor(cursor, SCORE_CURSOR)
+            where, params = ('1', ()) if after is None else ('score > ? OR (score = ? AND id > ?)', (after[0], after[0], after[1]))
+            rows = db.execute(f'''
+                SELECT * FROM (
+                    SELECT r.*, bm25(resources_fts, 10.0, 5.0, 1.0) AS score FROM resources_fts
+                    JOIN resources r ON r.id = resources_fts.rowid
+                    WHERE resources_fts MATCH ?
+                ) WHERE {where}
+                ORDER BY score, id LIMIT ?
+            ''', (fts_phrase(query),) + params + (limit + 1,)).fetchall()
+            if len(rows) > limit:
+                last = rows[limit - 1]
+                return rows[:limit], encode_cursor([last['score'], last['id']])
+            return rows, None
+        except sqlite3.OperationalError as e:
+            print(f"全文搜索失败，回退到 LIKE 查询: {e}")
+
+    search_term = f'%{query}%'
+    where, params = order_keyset(decode_cursor(cursor, ORDER_CURSOR))
+    rows = db.execute(f'''
+        SELECT * FROM resources
+        WHERE (name LIKE ? OR tags LIKE ? OR description LIKE ?) AND {where}
+        ORDER BY {RESOURCE_ORDER} LIMIT ?
+    ''', (search_term, search_term, search_term) + params + (limit + 1,)).fetchall()
+    if len(rows) > limit:
+        return rows[:limit], order_cursor(rows[limit - 1])
+    return rows, None
+
+def count_search_results(db, query):
+    """统计搜索结果总数（仅在第一页显示）"""
+    if len(query) >= 3:
+        try:
+            return db.execute('SELECT COUNT(*) FROM resources_fts WHERE resources_fts MATCH ?', (fts_phrase(query),)).fetchone()[0]
+        except sqlite3.OperationalError:
+            pass
+    search_term = f'%{query}%'
+    return db.execute('''
+        SELECT COUNT(*) FROM resources
+        WHERE name LIKE ? OR tags LIKE ? OR description LIKE ?
+    ''', (search_term, search_term, search_term)).fetchone()[0]
+
+# --- 内存只读模型 ---
+
+RESOURCE_COLUMNS = ('id', 'name', 'r_type', 'description', 'tg_link', 'pan_link', 'pan_pass', 'tags',
+                    'sort_order', 'created_at', 'updated_at', 'pan_link_status', 'tg_link_status')
+
+class ResourceView:
+    """快照中的一条资源：字段与 resources 表相同，另有拆分好的标签和小写搜索文本"""
+    __slots__ = RESOURCE_COLUMNS + ('tag_list', 'search_name', 'search_tags', 'search_description', 'position')
+
+    def __init__(self, values, position):
+        (self.id, self.name, self.r_type, self.description, self.tg_link, self.pan_link, self.pan_pass,
+         self.tags, self.sort_order, self.created_at, self.updated_at, self.pan_link_status, self.tg_link_status) = values
+        self.tag_list = split_tags(self.tags)
+        self.search_name = (self.name or '').lower()
+        self.search_tags = (self.tags or '').lower()
+        self.search_description = (self.description or '').lower()
+        self.position = position
+
+    def __getitem__(self, key):
+        return getattr(self, key)
+
+    def after(self, cursor):
+        """是否排在列表游标 (sort_order, updated_at, created_at, id) 之后，与 order_keyset 一致"""
+        sort_order, updated_at, created_at, item_id = cursor
+        if self.sort_order != sort_order:
+            return self.sort_order > sort_order
+        if self.updated_at != updated_at:
+            return (self.updated_at or '') < (updated_at or '')
+        if self.created_at != created_at:
+            return (self.created_at or '') < (created_at or '')
+        return self.id > item_id
+
+class CatalogSnapshot:
+    """按显示顺序排好的全部资源，以及标签到位置的索引
+
+    搜索不使用 FTS 的 bm25 分数，而是按匹配位置分级：名称 < 标签 < 描述，同级按显示顺序。
+    """
+    __slots__ = ('generation', 'items', 'positions', 'tag_positions', 'tag_facets', '_searches')
+
+    def __init__(self, generation, rows):
+        self.generation = generation
+        self.items = [ResourceView(row, i) for i, row in enumerate(rows)]
+        self.positions = {item.id: item.position for item in self.items}
+        self.tag_positions = {}
+        for item in self.items:
+            for tag in item.tag_list:
+                self.tag_positions.setdefault(tag, []).append(item.position)
+        counts = Counter({tag: len(positions) for tag, positions in self.tag_positions.items()})
+        self.tag_facets = [{'name': name, 'count': count}
+                           for name, count in sorted(counts.items(), key=lambda kv: (-kv[1], kv[0]))[:TAG_FACET_SIZE]]
+        self._searches = OrderedDict()
+
+    def start_position(self, cursor):
+        """列表游标之后第一条资源的位置"""
+        if cursor is None:
+            return 0
+        position = self.positions.get(cursor[3])
+        if position is not None and self.items[position].sort_order == cursor[0]:
+            return position + 1
+        # 游标对应的资源已被删除或移动，按排序键查找
+        for item in self.items:
+            if item.after(cursor):
+                return item.position
+        return len(self.items)
+
+    def page(self, cursor=None, limit=PAGE_SIZE, tag=None):
+        """按显示顺序分页（可按标签筛选），返回 (资源列表, 下一页游标)"""
+        start = self.start_position(decode_cursor(cursor, ORDER_CURSOR))
+        if tag:
+            positions = self.tag_positions.get(tag, [])
+            index = bisect.bisect_left(positions, start)
+            items = [self.items[position] for position in positions[index:index + limit + 1]]
+        else:
+            items = self.items[start:start + limit + 1]
+        if len(items) > limit:
+            return items[:limit], order_cursor(items[limit - 1])
+        return items, None
+
+    def count_tag(self, tag):
+        return len(self.tag_positions.get(tag, []))
+
+    def matches(self, query):
+        """搜索结果 [(匹配级别, 资源)]，按级别和显示顺序排序"""
+        needle = query.lower()
+        found = self._searches.get(needle)
+        if found is None:
+            found = []
+            for item in self.items:
+                if needle in item.search_name:
+                    found.append((0, item))
+                elif needle in item.search_tags:
+                    found.append((1, item))
+                elif needle in item.search_description:
+                    found.append((2, item))
+            found.sort(key=lambda match: (match[0], match[1].position))
+            self._searches[needle] = found
+            if len(self._searches) > READ_MODEL_SEARCH_CACHE:
+                self._searches.popitem(last=False)
+        return found
+
+    def search(self, query, cursor=None, limit=PAGE_SIZE):
+        """搜索分页，游标为 (匹配级别, 显示位置)"""
+        found = self.matches(query)
+        after = decode_cursor(cursor, POSITION_CURSOR)
+        start = 0 if after is None else bisect.bisect_right(found, tuple(after), key=lambda m: (m[0], m[1].position))
+        page = found[start:start + limit + 1]
+        if len(page) > limit:
+            level, item = page[limit - 1]
+            return [item for _, item in page[:limit]], encode_cursor([level, item.position])
+        return [item for _, item in page], None
+
+def get_snapshot():
+    """当前数据代数的只读快照，数据变化后由第一个请求重建"""
+    global _snapshot
+    check_external_changes()
+    snapshot = _snapshot
+    if snapshot is not None and snapshot.generation == _data_generation:
+        return snapshot
+    with _snapshot_lock:
+        if _snapshot is None or _snapshot.generation != _data_generation:
+            generation = _data_generation
+            # 按列顺序读取元组，省去 sqlite3.Row 的开销
+            cursor = get_db().cursor()
+            cursor.row_factory = None
+            rows = cursor.execute(f'SELECT {", ".join(RESOURCE_COLUMNS)} FROM resources ORDER BY {RESOURCE_ORDER}').fetchall()
+            _snapshot = CatalogSnapshot(generation, rows)
+        return _snapshot
+
+def check_external_changes():
+    """检测其他连接（包括其他 worker 进程）提交的写入，有变化时使本进程缓存失效
+
+    使用一个只读的专用连接：PRAGMA data_version 在其他连接提交后会改变。
+    """
+    global _change_watcher, _last_data_version
+    with _watcher_lock:
+        if _change_watcher is None:
+            _change_watcher = sqlite3.connect(db_pool.path, check_same_thread=False)
+        version = _change_watcher.execute('PRAGMA data_version').fetchone()[0]
+        changed = _last_data_version is not None and version != _last_data_version
+        _last_data_version = version
+    if changed:
+        bump_generation()
+
+def bump_generation():
+    """数据发生变化后递增数据代数，使所有页面缓存失效"""
+    global _data_generation
+    with _page_cache_lock:
+        _data_generation += 1
+        _page_cache.clear()
+    with _search_cache_lock:
+        _search_cache.clear()
+    with _change_condition:
+        _change_condition.notify_all()
+
+def get_cached_page(key):
+    """读取页面缓存，返回 (代数, 缓存内容)；未命中时缓存内容为 None"""
+    check_external_changes()
+    with _page_cache_lock:
+        entry = _page_cache.get(key)
+        if entry is not None:
+            _page_cache.move_to_end(key)
+        return _data_generation, entry
+
+def set_cached_page(key, generation, entry):
+    """写入页面缓存；渲染期间数据已变化则丢弃，避免缓存过期内容"""
+    with _page_cache_lock:
+        if generation != _data_generation:
+            return
+        _page_cache[key] = entry
+        _page_cache.move_to_end(key)
+        while len(_page_cache) > PAGE_CACHE_SIZE:
+            _page_cache.popitem(last=False)
+
+def get_current_notice():
+    """获取当前激活的公告（按数据代数缓存，公告修改后才重新查询）"""
+    global _notice_cache
+    check_external_changes()
+    generation = _data_generation
+    cached_generation, notice = _notice_cache
+    if cached_generation == generation:
+        return notice
+    try:
+        db = get_db()
+        cursor = db.execute('SELECT id, content, updated_at FROM notices WHERE is_enabled = 1 ORDER BY updated_at DESC LIMIT 1')
+        notice = cursor.fetchone()
+        _notice_cache = (generation, notice)
+        return notice
+    except Exception as e:
+        print(f"获取公告错误: {e}")
+        return None
+
+# --- 静态资源：内容哈希文件名 + 预压缩 ---
+
+ASSET_MAX_AGE = 365 * 24 * 3600  # 带哈希的资源内容不会变，缓存一年
+_assets = {}
+_assets_lock = threading.Lock()
+
+class StaticAsset:
+    """static 目录下的一个文件：内容哈希和预先压缩好的 gzip / brotli 版本"""
+    __slots__ = ('digest', 'mimetype', 'identity', 'gzip', 'br')
+
+    def __init__(self, data, mimetype):
+        self.digest = hashlib.sha256(data).hexdigest()[:12]
+        self.mimetype = mimetype
+        self.identity = data
+        self.gzip = gzip.compress(data, 9, mtime=0)
+        self.br = brotli.compress(data, quality=11) if brotli else None
+
+def load_asset(path):
+    """读取并缓存静态资源，调试模式下每次重新读取"""
+    asset = _assets.get(path)
+    if asset is None or app.debug:
+        full_path = safe_join(app.static_folder, path)
+        if full_path is None or not os.path.isfile(full_path):
+            return None
+        with open(full_path, 'rb') as f:
+            data = f.read()
+        asset = StaticAsset(data, mimetypes.guess_type(path)[0] or 'application/octet-stream')
+        with _assets_lock:
+            _assets[path] = asset
+    return asset
+
+@app.template_global()
+def asset_url(path):
+    """模板中引用静态资源：文件名带内容哈希，如 css/index.3f2a9c1b7d0e.css"""
+    asset = load_asset(path)
+    if asset is None:
+        return url_for('static', filename=path)
+    stem, ext = os.path.splitext(path)
+    return url_for('static_asset', filename=f'{stem}.{asset.digest}{ext}')
+
+@app.route('/assets/<path:filename>')
+def static_asset(filename):
+    """带哈希的静态资源：长期缓存，按 Accept-Encoding 直接返回预压缩的内容"""
+    stem, ext = os.path.splitext(filename)
+    base, _, digest = stem.rpartition('.')
+    asset = load_asset(base + ext) if base else None
+    if asset is None:
+        return 'Not Found', 404
+
+    encoding = None
+    body = asset.identity
+    if asset.br is not None and request.accept_encodings['br']:
+        encoding, body = 'br', asset.br
+    elif request.accept_encodings['gzip']:
+        encoding, body = 'gzip', asset.gzip
+
+    response = app.response_class(body, mimetype=asset.mimetype)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.set_etag(f'{asset.digest}-{encoding or "identity"}')
+    if digest == asset.digest:
+        response.headers['Cache-Control'] = f'public, max-age={ASSET_MAX_AGE}, immutable'
+    else:
+        # 旧页面引用了已更新的文件，返回当前内容但不长期缓存
+        response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+# --- 响应压缩与 HTTP 缓存头 ---
+
+COMPRESS_MIN_SIZE = 1024       # 小于该字节数的响应不压缩
+COMPRESS_MIMETYPES = {'text/html', 'application/json', 'text/plain'}
+GZIP_LEVEL = 6                 # 压缩等级折中：比最高等级快得多，体积只大几个百分点
+BROTLI_QUALITY = 5
+COMPRESSED_CACHE_SIZE = 256    # 缓存的压缩结果数（页面缓存命中时不必重复压缩）
+_compressed_cache = OrderedDict()
+_compressed_cache_lock = threading.Lock()
+
+def compress_body(body, encoding):
+    """压缩响应内容，相同内容的压缩结果会被缓存"""
+    key = (hashlib.sha1(body).digest(), encoding)
+    with _compressed_cache_lock:
+        compressed = _compressed_cache.get(key)
+        if compressed is not None:
+            _compressed_cache.move_to_end(key)
+            return compressed
+    if encoding == 'br':
+        compressed = brotli.compress(body, quality=BROTLI_QUALITY)
+    else:
+        compressed = gzip.compress(body, GZIP_LEVEL, mtime=0)
+    with _compressed_cache_lock:
+        _compressed_cache[key] = compressed
+        while len(_compressed_cache) > COMPRESSED_CACHE_SIZE:
+            _compressed_cache.popitem(last=False)
+    return compressed
+
+@app.after_request
+def compress_response(response):
+    """设置缓存头（公开页面可缓存但须用 ETag 重新验证，/admin 禁止缓存），并按 Accept-Encoding 压缩 HTML / JSON"""
+    if request.path.startswith('/assets/'):
+        return response  # 静态资源自带缓存头和预压缩内容
+
+    is_admin = request.path.startswith('/admin')
+    public_get = not is_admin and request.method == 'GET' and response.status_code == 200
+    if is_admin:
+        response.headers['Cache-Control'] = 'no-store'
+    elif 'Set-Cookie' in response.headers:
+        response.headers['Cache-Control'] = 'private, no-cache'
+    elif public_get and 'Cache-Control' not in response.headers:
+        # 可以缓存，但每次使用前都要用 ETag 重新验证，管理员修改后访客不会看到旧页面
+        response.headers['Cache-Control'] = 'public, no-cache'
+
+    if (response.is_streamed or response.direct_passthrough
+            or response.mimetype not in COMPRESS_MIMETYPES
+            or 'Content-Encoding' in response.headers):
+        return response
+    response.vary.add('Accept-Encoding')
+
+    if public_get:
+        if 'ETag' not in response.headers:
+            response.add_etag()
+        response.make_conditional(request)
+    if response.status_code != 200:
+        return response
+
+    body = response.get_data()
+    if len(body) < COMPRESS_MIN_SIZE:
+        return response
+    if brotli is not None and request.accept_encodings['br']:
+        encoding = 'br'
+    elif request.accept_encodings['gzip']:
+        encoding = 'gzip'
+    else:
+        return response
+
+    response.set_data(compress_body(body, encoding))
+    response.headers['Content-Encoding'] = encoding
+    # 压缩后内容与原文不同字节，强 ETag 改为弱 ETag（If-None-Match 按弱比较仍然命中）
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+# --- 路由逻辑 ---
+
+def page_response(html, next_cursor):
+    """构造页面响应，分页片段通过 X-Next-Cursor 头返回下一页游标"""
+    response = make_response(html)
+    if next_cursor is not None:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
+
+# --- 搜索缓存与限流 ---
+
+class TokenBucketLimiter:
+    """按客户端限流的令牌桶：每个客户端每秒补充 rate 个令牌，最多积攒 burst 个"""
+
+    def __init__(self, rate, burst, max_clients=RATE_LIMIT_CLIENTS):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets = OrderedDict()  # 客户端 -> (令牌数, 上次更新时间)
+        self._lock = threading.Lock()
+
+    def take(self, client):
+        """消耗一个令牌；成功返回 0，令牌不足时返回需要等待的秒数"""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(client, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0
+            else:
+                wait = (1 - tokens) / self.rate
+            self._buckets[client] = (tokens, now)
+            while len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        return wait
+
+search_limiter = TokenBucketLimiter(SEARCH_RATE, SEARCH_BURST)
+
+# 只折叠 ASCII 大小写：全文索引、LIKE 和内存快照三种搜索都不区分 ASCII 大小写，
+# 折叠后结果不变；全角/半角和其他字符的大小写在各种搜索方式中不等价，不能合并
+ASCII_LOWER = str.maketrans('ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz')
+
+def normalize_query(query):
+    """搜索缓存的键：去掉首尾空白并忽略 ASCII 大小写，只合并搜索结果必然相同的关键词
+
+    只用作缓存键，实际搜索仍使用用户输入的关键词。
+    """
+    return query.strip().translate(ASCII_LOWER)
+
+def cached_search(key, build):
+    """按规范化关键词缓存搜索结果
+
+    命中时直接返回；未命中时先按客户端 IP 限流再执行 build()。
+    返回 (结果, 0)，被限流时返回 (None, 需要等待的秒数)。
+    """
+    check_external_changes()
+    now = time.monotonic()
+    with _search_cache_lock:
+        generation = _data_generation
+        entry = _search_cache.get(key)
+        if entry is not None and entry[0] == generation and entry[1] > now:
+            _search_cache.move_to_end(key)
+            metrics.inc('jb_search_cache_total', (('result', 'hit'),))
+            return entry[2], 0
+    metrics.inc('jb_search_cache_total', (('result', 'miss'),))
+
+    if SEARCH_RATE > 0:
+        wait = search_limiter.take(request.remote_addr or '')
+        if wait:
+            metrics.inc('jb_search_rate_limited_total', ())
+            return None, wait
+
+    result = build()
+    with _search_cache_lock:
+        # 执行期间数据已变化则不缓存
+        if generation == _data_generation:
+            _search_cache[key] = (generation, now + SEARCH_CACHE_TTL, result)
+            _search_cache.move_to_end(key)
+            while len(_search_cache) > SEARCH_CACHE_SIZE:
+                _search_cache.popitem(last=False)
+    return result, 0
+
+def retry_after(wait):
+    """限流响应的 Retry-After 头（整数秒）"""
+    return {'Retry-After': str(max(1, int(wait + 0.999)))}
+
+@app.route('/')
+def index():
+    """首页 - 显示资源列表"""
+    try:
+        query = (request.args.get('q') or '').strip() or None  # 获取搜索关键词
+        tag = None if query else request.args.get('tag')  # 标签筛选
+        cursor = request.args.get('cursor')  # 分页游标
+        partial = request.args.get('partial') == '1'
+
+        # 静态发布模式下首页直接返回已发布的文件
+        if PUBLISH_DIR and not (query or tag or cursor or partial):
+            response = published_response('index.html')
+            if response is not None:
+                return response
+
+        result_count = None
+
+        if query:
+            # 搜索结果单独按规范化关键词缓存，随机关键词不会挤掉页面缓存中的列表页
+            def build():
+                if READ_MODEL:
+                    snapshot = get_snapshot()
+                    resources, next_cursor = snapshot.search(query, cursor)
+                    return resources, next_cursor, None if cursor else len(snapshot.matches(query))
+                db = get_db()
+                rows, next_cursor = search_resources(db, query, cursor)
+                return with_tag_lists(rows), next_cursor, None if cursor else count_search_results(db, query)
+
+            result, wait = cached_search(('page', normalize_query(query), cursor or ''), build)
+            if result is None:
+                return '搜索过于频繁，请稍后再试', 429, retry_after(wait)
+            resources, next_cursor, result_count = result
+            cache_key = generation = None
+        else:
+            # 命中缓存时直接返回渲染好的页面
+            cache_key = (tag or '', cursor or '', partial)
+            generation, cached = get_cached_page(cache_key)
+            if cached is not None:
+                return page_response(*cached)
+
+            if READ_MODEL:
+                snapshot = get_snapshot()
+                resources, next_cursor = snapshot.page(cursor, tag=tag)
+                if tag and not cursor:
+                    result_count = snapshot.count_tag(tag)
+            else:
+                db = get_db()
+                rows, next_cursor = list_resources(db, cursor, tag=tag)
+                if tag and not cursor:
+                    result_count = count_tag_resources(db, tag)
+                resources = with_tag_lists(rows)
+
+        # "加载更多" 只返回资源卡片片段
+        if partial:
+            entry = (render_template('_resource_cards.html', resources=resources), next_cursor or '')
+            if cache_key is not None:
+                set_cached_page(cache_key, generation, entry)
+            return page_response(*entry)
+
+        if query or tag or cursor:
+            # 搜索、标签筛选和翻页时不显示公告  
+            notice = None  
+            notice_id = None  
+            notice_updated_at = None  
+            tag_facets = []
+        else:  
+            # 只有主页才显示公告和标签导航
+            notice = get_current_notice()  
+            if notice:  
+                notice_id = notice['id']  
+                notice_updated_at = notice['updated_at']  
+            else:  
+                notice_id = None  
+                notice_updated_at = None  
+            tag_facets = get_snapshot().tag_facets if READ_MODEL else get_tag_facets(get_db())
+          
+        html = render_template('index.html',   
+                               resources=resources,   
+                               search_query=query,   
+                               current_tag=tag,
+                               tag_facets=tag_facets,
+                               result_count=result_count,
+                               next_cursor=next_cursor,
+                               notice=notice,   
+                               notice_id=notice_id,   
+                               notice_updated_at=notice_updated_at)
+        if cache_key is not None:
+            set_cached_page(cache_key, generation, (html, None))
+        return html
+    except Exception as e:
+        print(f"首页错误: {e}")
+        return '系统繁忙，请稍后重试', 503
+
+# --- JSON 只读接口 ---
+
+def serialize_resource(row):
+    """资源转换为 JSON 对象"""
+    return {
+        'id': row['id'],
+        'name': row['name'],
+        'r_type': row['r_type'],
+        'description': row['description'],
+        'tg_link': row['tg_link'],
+        'pan_link': row['pan_link'],
+        'pan_pass': row['pan_pass'],
+        'tags': split_tags(row['tags']),
+        'created_at': row['created_at'],
+        'updated_at': row['updated_at'],
+        'pan_link_status': row['pan_link_status'],
+        'tg_link_status': row['tg_link_status'],
+        'link_checked_at': row['link_checked_at'],
+    }
+
+def parse_timestamp(value):
+    """解析 SQLite CURRENT_TIMESTAMP 格式（UTC）的时间"""
+    try:
+        return datetime.strptime(value[:19], '%Y-%m-%d %H:%M:%S').replace(tzinfo=timezone.utc)
+    except (TypeError, ValueError):
+        return None
+
+def json_response(body, etag, last_modified=None):
+    """带强 ETag 的 JSON 响应，If-None-Match / If-Modified-Since 命中时返回 304"""
+    response = app.response_class(body, mimetype='application/json')
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    return response.make_conditional(request)
+
+def cached_json(cache_key, build):
+    """按数据代数缓存 JSON 响应体；ETag 取自响应内容，多进程和重启后保持一致"""
+    generation, cached = get_cached_page(cache_key)
+    if cached is None:
+        body = json.dumps(build(), ensure_ascii=False, separators=(',', ':'))
+        cached = (body, hashlib.sha1(body.encode('utf-8')).hexdigest())
+        set_cached_page(cache_key, generation, cached)
+    return cached
+
+@app.route('/api/resources')
+def api_resources():
+    """资源列表 / 搜索 / 标签筛选接口"""
+    query = (request.args.get('q') or '').strip() or None
+    tag = None if query else request.args.get('tag')
+    cursor = request.args.get('cursor')
+    try:
+        limit = min(max(int(request.args.get('limit', PAGE_SIZE)), 1), API_MAX_LIMIT)
+    except ValueError:
+        return jsonify({'success': False, 'message': '参数无效'}), 400
+
+    def build():
+        db = get_db()
+        if query:
+            rows, next_cursor = search_resources(db, query, cursor, limit)
+        else:
+            rows, next_cursor = list_resources(db, cursor, limit, tag=tag)
+        return {
+            'success': True,
+            'resources': [serialize_resource(row) for row in rows],
+            'next_cursor': next_cursor,
+        }
+
+    try:
+        if query:
+            def build_body():
+                body = json.dumps(build(), ensure_ascii=False, separators=(',', ':'))
+                return body, hashlib.sha1(body.encode('utf-8')).hexdigest()
+
+            cached, wait = cached_search(('api', normalize_query(query), cursor or '', limit), build_body)
+            if cached is None:
+                return jsonify({'success': False, 'message': '搜索过于频繁，请稍后再试'}), 429, retry_after(wait)
+            body, etag = cached
+        else:
+            body, etag = cached_json(('api', tag or '', cursor or '', limit), build)
+        return json_response(body, etag)
+    except Exception as e:
+        print(f"资源接口错误: {e}")
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+@app.route('/api/resources/<int:resource_id>')
+def api_resource(resource_id):
+    """单个资源接口"""
+    try:
+        row = get_db().execute('SELECT * FROM resources WHERE id = ?', (resource_id,)).fetchone()
+        if not row:
+            return jsonify({'success': False, 'message': '资源不存在'}), 404
+
+        body = json.dumps({'success': True, 'resource': serialize_resource(row)}, ensure_ascii=False, separators=(',', ':'))
+        etag = hashlib.sha1(body.encode('utf-8')).hexdigest()
+        return json_response(body, etag, parse_timestamp(row['updated_at']))
+    except Exception as e:
+        print(f"资源接口错误: {e}")
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+@app.route('/api/notice')
+def api_notice():
+    """当前公告接口
+
+    ETag 由公告 id 和更新时间组成（与首页 localStorage 的键相同），客户端可以用
+    If-None-Match，或 ?notice_id=&updated_at= 带上已有的公告，未变化时返回 304。
+    """
+    notice = get_current_notice()
+    if notice:
+        etag = f'notice-{notice["id"]}-{notice["updated_at"]}'
+        if (request.args.get('notice_id') == str(notice['id'])
+                and request.args.get('updated_at') == notice['updated_at']):
+            response = app.response_class(status=304)
+            response.set_etag(etag)
+            return response
+        data = {
+            'id': notice['id'],
+            'content': notice['content'],
+            'updated_at': notice['updated_at'],
+            'key': f'notice_hidden_{notice["id"]}_{notice["updated_at"]}',
+        }
+        body = json.dumps({'success': True, 'notice': data}, ensure_ascii=False, separators=(',', ':'))
+        return json_response(body, etag, parse_timestamp(notice['updated_at']))
+    return json_response(json.dumps({'success': True, 'notice': None}), 'notice-none')
+
+# --- 增量变更订阅 ---
+
+FEED_PAGE_SIZE = 200         # 每次返回的变更数
+FEED_MAX_LIMIT = 1000
+FEED_MAX_WAIT = 30           # 长轮询最长等待秒数
+SSE_MAX_DURATION = 300       # 单个 SSE 连接的最长时间，之后客户端凭 Last-Event-ID 自动重连
+SSE_HEARTBEAT = 15           # SSE 心跳间隔秒数
+# 每个 SSE 连接在整个连接期间占用一个 gthread 线程，每个进程最多同时保持的连接数，
+# 默认不超过线程数的一半，超出时返回 503，客户端可改用长轮询
+SSE_MAX_STREAMS = int(os.environ.get('SSE_MAX_STREAMS', max(1, int(os.environ.get('WEB_THREADS', 4)) // 2)))
+_sse_slots = threading.BoundedSemaphore(SSE_MAX_STREAMS)
+
+def read_changes(db, since, limit):
+    """读取游标之后的变更
+
+    游标为 (epoch, seq)。没有游标、epoch 不符或序号超出范围时 reset 为真，
+    从头返回（即当前全部资源及删除墓碑），订阅方应丢弃本地数据重新同步。
+    """
+    epoch = db.execute('SELECT epoch FROM feed_state').fetchone()[0]
+    max_seq = db.execute('SELECT COALESCE(MAX(seq), 0) FROM resource_changes').fetchone()[0]
+    after = decode_cursor(since, FEED_CURSOR)
+    reset = after is None or after[0] != epoch or after[1] > max_seq
+    since_seq = 0 if reset else after[1]
+
+    rows = db.execute('''
+        SELECT c.seq AS change_seq, c.op AS change_op, c.resource_id AS change_resource_id, r.*
+        FROM resource_changes c LEFT JOIN resources r ON r.id = c.resource_id
+        WHERE c.seq > ? ORDER BY c.seq LIMIT ?
+    ''', (since_seq, limit + 1)).fetchall()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    changes = []
+    for row in rows:
+        resource = None
+        if row['change_op'] != 'delete' and row['id'] is not None:
+            resource = dict(serialize_resource(row), sort_order=row['sort_order'])
+        changes.append({
+            'seq': row['change_seq'],
+            'op': 'upsert' if resource else 'delete',
+            'id': row['change_resource_id'],
+            'resource': resource,
+        })
+    last_seq = rows[-1]['change_seq'] if rows else since_seq
+    return {
+        'success': True,
+        'reset': reset,
+        'changes': changes,
+        'cursor': encode_cursor([epoch, last_seq]),
+        'has_more': has_more,
+    }
+
+def wait_for_changes(generation, timeout):
+    """等待数据代数变化：本进程的写入立即唤醒，其他 worker 的写入每 0.5 秒检测一次"""
+    deadline = time.monotonic() + timeout
+    while True:
+        check_external_changes()
+        if _data_generation != generation:
+            return True
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
+        with _change_condition:
+            _change_condition.wait(min(0.5, remaining))
+
+def read_changes_once(since, limit):
+    """不依赖请求上下文读取一次变更（SSE 生成器中使用）"""
+    db = db_pool.acquire()
+    try:
+        return read_changes(db, since, limit)
+    finally:
+        db_pool.release(db)
+
+@app.route('/api/changes')
+def api_changes():
+    """增量变更接口：?since=<游标>，可选 wait=<秒> 长轮询等待新变更"""
+    try:
+        limit = min(max(int(request.args.get('limit', FEED_PAGE_SIZE)), 1), FEED_MAX_LIMIT)
+        wait = float(request.args.get('wait', 0))
+        if not math.isfinite(wait):
+            raise ValueError(wait)
+        wait = min(max(wait, 0), FEED_MAX_WAIT)
+    except ValueError:
+        return jsonify({'success': False, 'message': '参数无效'}), 400
+    since = request.args.get('since')
+
+    try:
+        generation = _data_generation
+        body = read_changes(get_db(), since, limit)
+        if wait and not body['changes'] and not body['reset']:
+            release_db()  # 等待期间不占用连接
+            if wait_for_changes(generation, wait):
+                body = read_changes(get_db(), since, limit)
+        response = jsonify(body)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+    except Exception as e:
+        print(f"变更接口错误: {e}")
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+@app.route('/api/changes/stream')
+def api_changes_stream():
+    """增量变更的 Server-Sent Events 推送，断线重连时从 Last-Event-ID 继续"""
+    since = request.headers.get('Last-Event-ID') or request.args.get('since')
+    if not _sse_slots.acquire(blocking=False):
+        return jsonify({'success': False, 'message': '推送连接已满，请改用 /api/changes?wait= 长轮询'}), 503, {'Retry-After': str(FEED_MAX_WAIT)}
+
+    def events(cursor):
+        started = time.monotonic()
+        last_sent = started
+        while time.monotonic() - started < SSE_MAX_DURATION:
+            generation = _data_generation
+            body = read_changes_once(cursor, FEED_PAGE_SIZE)
+            if body['changes'] or body['reset']:
+                cursor = body['cursor']
+                data = json.dumps(body, ensure_ascii=False, separators=(',', ':'))
+                yield f'id: {cursor}\nevent: changes\ndata: {data}\n\n'
+                last_sent = time.monotonic()
+                if body['has_more']:
+                    continue
+            if not wait_for_changes(generation, SSE_HEARTBEAT) and time.monotonic() - last_sent >= SSE_HEARTBEAT:
+                yield ': heartbeat\n\n'
+                last_sent = time.monotonic()
+
+    response = app.response_class(events(since), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    response.call_on_close(_sse_slots.release)  # 推送结束或客户端断开时释放名额
+    return response
+
+# --- 链接健康检查 ---
+
+LINK_CHECK_INTERVAL = int(os.environ.get('LINK_CHECK_INTERVAL', '0'))  # 后台定时检查间隔秒数，0 表示不启动
+LINK_CHECK_BATCH = 500          # 每轮最多检查的资源数，最久未检查的优先
+LINK_RECHECK_AGE = 24 * 3600    # 检查结果的有效期，过期后重新检查
+LINK_MAX_CONNECTIONS = 20       # 同时打开的连接数上限
+LINK_PER_HOST = 2               # 每个主机的并发上限
+LINK_TIMEOUT = 10               # 单个请求（含连接）超时秒数
+LINK_MAX_REDIRECTS = 3
+LINK_DEAD_STATUSES = {404, 410}
+# 表示域名确实不存在的解析错误（EAI_NODATA 并非所有平台都有）
+DNS_NOT_FOUND_ERRORS = {socket.EAI_NONAME, getattr(socket, 'EAI_NODATA', socket.EAI_NONAME)}
+# 公开页面是否隐藏已失效的链接（环境变量 HIDE_DEAD_LINKS=1）
+HIDE_DEAD_LINKS = os.environ.get('HIDE_DEAD_LINKS') == '1'
+app.jinja_env.globals['hide_dead_links'] = HIDE_DEAD_LINKS
+_link_check_lock = threading.Lock()
+
+class LinkChecker:
+    """基于 asyncio 的链接检查：全局连接数和每主机并发都有上限
+
+    只用标准库实现最小的 HTTP/1.1 客户端：先发 HEAD，服务器不支持时改用 GET，跟随跳转。
+    """
+
+    def __init__(self, max_connections=LINK_MAX_CONNECTIONS, per_host=LINK_PER_HOST, timeout=LINK_TIMEOUT):
+        self.timeout = timeout
+        self.per_host = per_host
+        self._connections = asyncio.Semaphore(max_connections)
+        self._hosts = {}
+        self._ssl = ssl.create_default_context()
+
+    def _host_limit(self, host):
+        if host not in self._hosts:
+            self._hosts[host] = asyncio.Semaphore(self.per_host)
+        return self._hosts[host]
+
+    async def _request(self, method, url):
+        """发送一个请求，返回 (状态码, Location 头)；超时只计算占用连接的时间，不含排队"""
+        parts = urlsplit(url)
+        if parts.scheme not in ('http', 'https') or not parts.hostname:
+            raise ValueError('不支持的链接')
+        async with self._host_limit(parts.hostname), self._connections:
+            return await asyncio.wait_for(self._exchange(method, parts), self.timeout)
+
+    async def _exchange(self, method, parts):
+        https = parts.scheme == 'https'
+        port = parts.port or (443 if https else 80)
+        target = quote(parts.path or '/', safe="/%:@!$&'()*+,;=-._~") + (f'?{parts.query}' if parts.query else '')
+        host_header = parts.hostname if parts.port is None else f'{parts.hostname}:{parts.port}'
+
+        reader, writer = await asyncio.open_connection(
+            parts.hostname, port, ssl=self._ssl if https else None,
+            server_hostname=parts.hostname if https else None)
+        try:
+            writer.write((f'{method} {target} HTTP/1.1\r\nHost: {host_header}\r\n'
+                          'User-Agent: Mozilla/5.0 (link-checker)\r\nAccept: */*\r\nConnection: close\r\n\r\n').encode('latin-1', 'ignore'))
+            await writer.drain()
+            status_line = await reader.readline()
+            location = None
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                if name.strip().lower() == 'location':
+                    location = value.strip()
+        finally:
+            writer.close()
+        fields = status_line.split()
+        if len(fields) < 2 or not fields[1].isdigit():
+            raise ValueError('无效的 HTTP 响应')
+        return int(fields[1]), location
+
+    async def _status(self, url):
+        method = 'HEAD'
+        redirects = 0
+        while True:
+            status, location = await self._request(method, url)
+            if status in (301, 302, 303, 307, 308) and location and redirects < LINK_MAX_REDIRECTS:
+                url = urljoin(url, location)
+                redirects += 1
+            elif method == 'HEAD' and status in (400, 403, 405, 501):
+                method = 'GET'  # 部分网盘不支持 HEAD
+            else:
+                return status
+
+    async def check(self, url):
+        """返回 'ok' / 'dead' / 'error'（超时、拒绝访问等无法判断的情况）"""
+        try:
+            status = await self._status(url)
+        except socket.gaierror as e:
+            # 只有“域名不存在 / 没有记录”才算失效；临时解析失败、DNS 服务器不可达等按 error 处理
+            if e.errno in DNS_NOT_FOUND_ERRORS:
+                return 'dead'
+            return 'error'
+        except (OSError, asyncio.TimeoutError, ValueError, ssl.SSLError):
+            return 'error'
+        if status in LINK_DEAD_STATUSES:
+            return 'dead'
+        return 'ok' if status < 400 else 'error'
+
+    async def check_resources(self, rows):
+        """检查一批资源，返回 [(pan_link 状态, tg_link 状态, 资源 id)]"""
+        async def check_row(row):
+            pan, tg = await asyncio.gather(
+                self.check(row['pan_link']) if row['pan_link'] else none(),
+                self.check(row['tg_link']) if row['tg_link'] else none())
+            return pan, tg, row['id']
+
+        async def none():
+            return None
+
+        return await asyncio.gather(*(check_row(row) for row in rows))
+
+def stale_link_rows(db, limit, max_age=LINK_RECHECK_AGE):
+    """最久未检查（从未检查的最先）且已过期的资源"""
+    return db.execute('''
+        SELECT id, pan_link, tg_link FROM resources
+        WHERE (COALESCE(pan_link, '') != '' OR COALESCE(tg_link, '') != '')
+          AND (link_checked_at IS NULL OR link_checked_at <= datetime('now', ?))
+        ORDER BY link_checked_at IS NOT NULL, link_checked_at, id
+        LIMIT ?
+    ''', (f'-{int(max_age)} seconds', limit)).fetchall()
+
+def save_link_results(db, results):
+    """写线程中保存检查结果"""
+    db.executemany('''
+        UPDATE resources SET pan_link_status = ?, tg_link_status = ?, link_checked_at = CURRENT_TIMESTAMP
+        WHERE id = ?
+    ''', results)
+
+def run_link_check(limit=LINK_CHECK_BATCH, max_age=LINK_RECHECK_AGE):
+    """检查一轮过期链接，返回各状态的数量；已有检查在进行时返回 None"""
+    if not _link_check_lock.acquire(blocking=False):
+        return None
+    try:
+        if not _schema_ready:
+            init_db()
+        db = db_pool.acquire()
+        try:
+            rows = [dict(row) for row in stale_link_rows(db, limit, max_age)]
+        finally:
+            db_pool.release(db)
+        if not rows:
+            return {}
+
+        async def check_all():
+            return await LinkChecker().check_resources(rows)
+
+        results = asyncio.run(check_all())
+        write_queue.run(save_link_results, results)
+        return dict(Counter(status for result in results for status in result[:2] if status))
+    finally:
+        _link_check_lock.release()
+
+def link_check_loop():
+    """后台定时检查；多个 worker 通过文件锁保证只有一个进程在运行"""
+    lock_file = open(db_pool.path + '.linkcheck.lock', 'w')
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return
+    while True:
+        try:
+            summary = run_link_check()
+            if summary:
+                print(f"链接检查完成: {summary}")
+        except Exception as e:
+            print(f"链接检查错误: {e}")
+        time.sleep(LINK_CHECK_INTERVAL)
+
+def start_link_checker():
+    """LINK_CHECK_INTERVAL 大于 0 时启动后台检查线程"""
+    if LINK_CHECK_INTERVAL > 0:
+        threading.Thread(target=link_check_loop, name='link-checker', daemon=True).start()
+
+def link_status_summary(db):
+    """管理页面显示的链接检查统计"""
+    row = db.execute('''
+        SELECT
+            SUM(link_checked_at IS NOT NULL) AS checked,
+            SUM(pan_link_status = 'dead' OR tg_link_status = 'dead') AS dead,
+            SUM(pan_link_status = 'error' OR tg_link_status = 'error') AS error,
+            SUM(link_checked_at IS NULL AND (COALESCE(pan_link, '') != '' OR COALESCE(tg_link, '') != '')) AS unchecked,
+            MAX(link_checked_at) AS last_checked
+        FROM resources
+    ''').fetchone()
+    return {key: row[key] or 0 for key in ('checked', 'dead', 'error', 'unchecked')} | {'last_checked': row['last_checked']}
+
+@app.route('/admin/check_links', methods=['POST'])
+def check_links():
+    """立即在后台检查一轮过期链接"""
+    if _link_check_lock.locked():
+        flash('链接检查正在进行中，请稍后刷新查看结果', 'warning')
+    else:
+        threading.Thread(target=run_link_check, kwargs={'max_age': 0 if request.form.get('all') else LINK_RECHECK_AGE},
+                         daemon=True).start()
+        flash('已开始检查链接，完成后刷新页面查看结果', 'success')
+    return redirect(url_for('admin'))
+
+@app.cli.command('check-links')
+@click.option('--limit', default=LINK_CHECK_BATCH, show_default=True, help='本次最多检查的资源数')
+@click.option('--all', 'check_all', is_flag=True, help='忽略有效期，重新检查所有链接')
+def check_links_command(limit, check_all):
+    """检查资源链接是否失效（适合放在 cron 中定时执行）"""
+    summary = run_link_check(limit, 0 if check_all else LINK_RECHECK_AGE)
+    if summary is None:
+        click.echo('已有链接检查在进行中')
+    else:
+        click.echo(f'检查完成: {summary or "没有需要检查的链接"}')
+
+# --- 静态发布 ---
+#
+# 发布目录结构（前端代理把站点根目录指向 PUBLISH_DIR/current 即可，/admin 和搜索交给 Flask）：
+#   current -> releases/<版本>       符号链接，整体原子切换
+#   index.html                       首页
+#   page/<N>.html, page/<N>.part.html  第 N 页完整页面 / "加载更多" 片段
+#   api/page/<N>.json                第 N 页 JSON
+# 每个文件另有 .gz 预压缩版本。
 
-def get_db():
-    """获取数据库连接"""
-    try:
-        db = getattr(g, '_database', None)
-        if db is None:
-            if not os.path.exists(DATABASE):
-                init_db()  # 如果数据库文件不存在，先初始化
-            db = g._database = sqlite3.connect(DATABASE)
-            db.row_factory = sqlite3.Row
-        return db
-    except Exception as e:
-        print(f"获取数据库连接错误: {e}")
-        init_db()  # 发生错误时尝试重新初始化
-        db = g._database = sqlite3.connect(DATABASE)
-        db.row_factory = sqlite3.Row
-        return db
+def schedule_publish():
+    """写入提交后安排一次后台发布（防抖：连续写入合并为一次）"""
+    global _publish_timer, _publish_first_request
+    if not PUBLISH_DIR:
+        return
+    with _publish_state_lock:
+        now = time.monotonic()
+        if _publish_timer is not None:
+            if now - _publish_first_request >= PUBLISH_MAX_DELAY:
+                return  # 已等待太久，不再推迟即将执行的发布
+            _publish_timer.cancel()
+        else:
+            _publish_first_request = now
+        _publish_timer = threading.Timer(PUBLISH_DELAY, run_publish)
+        _publish_timer.daemon = True
+        _publish_timer.start()
 
-@app.teardown_appcontext
-def close_connection(exception):
-    """关闭数据库连接"""
-    db = getattr(g, '_database', None)
-    if db is not None:
+def run_publish():
+    """后台发布任务"""
+    global _publish_timer
+    with _publish_state_lock:
+        _publish_timer = None
+    with _publish_lock:
         try:
-            db.close()
-        except:
-            pass
+            started = time.perf_counter()
+            pages = publish_site()
+            print(f"静态页面已发布: {pages} 页, 耗时 {time.perf_counter() - started:.2f}s")
+        except Exception as e:
+            print(f"静态发布错误: {e}")
 
-def init_db():
-    """初始化数据库"""
-    try:
-        db = sqlite3.connect(DATABASE)
-        
-        # 创建资源表
-        db.execute('''  
-            CREATE TABLE IF NOT EXISTS resources (  
-                id INTEGER PRIMARY KEY AUTOINCREMENT,  
-                name TEXT NOT NULL,  
-                r_type TEXT,  
-                description TEXT,  
-                tg_link TEXT,  
-                pan_link TEXT,  
-                pan_pass TEXT,  
-                tags TEXT,  
-                sort_order INTEGER DEFAULT 0,  
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,  
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP  
-            )  
-        ''')  
-          
-        # 创建公告表  
-        db.execute('''  
-            CREATE TABLE IF NOT EXISTS notices (  
-                id INTEGER PRIMARY KEY AUTOINCREMENT,  
-                content TEXT NOT NULL,  
-                is_enabled INTEGER DEFAULT 0,  
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,  
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP  
-            )  
-        ''')  
-          
-        # 检查是否有公告数据，没有则初始化一条默认公告  
-        cursor = db.execute('SELECT COUNT(*) as count FROM notices')  
-        notice_count = cursor.fetchone()[0]  
-        if notice_count == 0:  
-            db.execute('''  
-                INSERT INTO notices (content, is_enabled)   
-                VALUES ('欢迎使用资源分享站！', 0)  
-            ''')  
-              
-        # 检查是否需要添加 sort_order 列  
-        try:  
-            cursor = db.execute("PRAGMA table_info(resources)")  
-            columns = [column[1] for column in cursor.fetchall()]  
-              
-            if 'sort_order' not in columns:  
-                db.execute("ALTER TABLE resources ADD COLUMN sort_order INTEGER DEFAULT 0")  
-                  
-                # 为现有数据设置排序
-                try:
-                    cursor = db.execute('SELECT id FROM resources ORDER BY created_at DESC')  
-                    existing_resources = cursor.fetchall()  
-                    for i, resource in enumerate(existing_resources):  
-                        db.execute('UPDATE resources SET sort_order = ? WHERE id = ?', (i, resource[0],))  
-                except:
-                    pass  # 如果没有数据，忽略错误
-                    
-            # 检查是否需要添加 updated_at 列  
-            if 'updated_at' not in columns:  
-                db.execute("ALTER TABLE resources ADD COLUMN updated_at TIMESTAMP")  
-                  
-                try:
-                    cursor = db.execute('SELECT id FROM resources WHERE updated_at IS NULL')  
-                    existing_resources = cursor.fetchall()  
-                    for resource in existing_resources:  
-                        db.execute('UPDATE resources SET updated_at = CURRENT_TIMESTAMP WHERE id = ?', (resource[0],))  
-                except:
-                    pass  # 如果没有数据，忽略错误
-                    
-        except Exception as e:  
-            print(f"检查列结构时出错: {e}")  
-          
-        db.commit()
-        db.close()
-        print("数据库初始化完成")
-            
-    except Exception as e:
-        print(f"数据库初始化错误: {e}")
+def write_release_file(release_dir, name, data):
+    """写入发布文件及其 gzip 版本"""
+    path = os.path.join(release_dir, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    with open(path, 'wb') as f:
+        f.write(data)
+    with open(path + '.gz', 'wb') as f:
+        f.write(gzip.compress(data, 9, mtime=0))
 
-def get_current_notice():
-    """获取当前激活的公告"""
+def publish_lock(blocking=True):
+    """发布目录的文件锁，多个 worker 的发布和清理互斥；非阻塞获取失败时返回 None"""
+    os.makedirs(PUBLISH_DIR, exist_ok=True)
+    lock_file = open(os.path.join(PUBLISH_DIR, '.publish.lock'), 'w')
     try:
-        db = get_db()
-        cursor = db.execute('SELECT id, content, updated_at FROM notices WHERE is_enabled = 1 ORDER BY updated_at DESC LIMIT 1')
-        return cursor.fetchone()
-    except Exception as e:
-        print(f"获取公告错误: {e}")
+        fcntl.flock(lock_file, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+    except OSError:
+        lock_file.close()
         return None
+    return lock_file
 
-def check_db_tables():
-    """检查数据库表是否存在"""
-    try:
-        db = get_db()
-        cursor = db.cursor()
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
-        tables = [row[0] for row in cursor.fetchall()]
-        
-        required_tables = ['resources', 'notices']
-        missing_tables = [table for table in required_tables if table not in tables]
-        
-        if missing_tables:
-            print(f"缺少表: {missing_tables}")
-            init_db()  # 重新初始化数据库
+_startup_publisher = None
+
+def claim_startup_publish():
+    """只让一个 worker 负责启动时的发布：持有文件锁直到进程退出，其他 worker 获取失败后跳过"""
+    global _startup_publisher
+    if _startup_publisher is None:
+        os.makedirs(PUBLISH_DIR, exist_ok=True)
+        lock_file = open(os.path.join(PUBLISH_DIR, '.startup.lock'), 'w')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
             return False
-        return True
-    except Exception as e:
-        print(f"检查数据库表错误: {e}")
-        init_db()
-        return False
+        _startup_publisher = lock_file
+    return True
 
-# --- 路由逻辑 ---
+def publish_site():
+    """把首页和全部分页渲染到新的发布版本目录，然后原子切换 current 链接，返回页数
 
-@app.route('/')
-def index():
-    """首页 - 显示资源列表"""
-    try:
-        # 确保数据库表存在
-        if not check_db_tables():
-            flash('数据库已重新初始化', 'info')
-        
+    整个过程持有发布目录的文件锁，多个 worker 同时发布时依次进行，清理旧版本时不会删掉别的进程刚切换的版本。
+    """
+    with publish_lock():
+        return publish_release()
+
+def publish_release():
+    """publish_site 的实际发布过程（调用方持有发布锁）"""
+    releases_dir = os.path.join(PUBLISH_DIR, 'releases')
+    os.makedirs(releases_dir, exist_ok=True)
+    release_name = f'{datetime.now():%Y%m%d%H%M%S%f}-{os.getpid()}'
+    release_dir = os.path.join(releases_dir, release_name)
+
+    with app.test_request_context('/'):
         db = get_db()
-        query = request.args.get('q')  # 获取搜索关键词
-
-        if query:  
-            search_term = f'%{query}%'  
-            sql = '''  
-                SELECT * FROM resources   
-                WHERE name LIKE ? OR tags LIKE ? OR description LIKE ?   
-                ORDER BY sort_order ASC, updated_at DESC, created_at DESC  
-            '''  
-            cur = db.execute(sql, (search_term, search_term, search_term))  
-            # 搜索时不显示公告  
-            notice = None  
-            notice_id = None  
-            notice_updated_at = None  
-        else:  
-            cur = db.execute('SELECT * FROM resources ORDER BY sort_order ASC, updated_at DESC, created_at DESC')  
-            # 只有主页才显示公告  
-            notice = get_current_notice()  
-            if notice:  
-                notice_id = notice['id']  
-                notice_updated_at = notice['updated_at']  
-            else:  
-                notice_id = None  
-                notice_updated_at = None  
-          
-        resources = cur.fetchall()  
-        return render_template('index.html',   
-                               resources=resources,   
-                               search_query=query,   
-                               notice=notice,   
-                               notice_id=notice_id,   
-                               notice_updated_at=notice_updated_at)
-    except Exception as e:
-        print(f"首页错误: {e}")
-        flash('系统错误，正在重新初始化数据库...', 'error')
-        init_db()
-        return redirect(url_for('index'))
+        db.execute('BEGIN')  # 在同一个读事务中读取，所有页面来自同一份数据
+        try:
+            pages = []
+            cursor = None
+            while True:
+                rows, cursor = list_resources(db, cursor)
+                pages.append(rows)
+                if not cursor:
+                    break
+            notice = get_current_notice()
+            tag_facets = get_tag_facets(db)
+        finally:
+            db.rollback()
+
+        total = len(pages)
+        for number, rows in enumerate(pages, start=1):
+            resources = with_tag_lists(rows)
+            first = number == 1
+            html = render_template('index.html',
+                                   resources=resources,
+                                   search_query=None,
+                                   current_tag=None,
+                                   tag_facets=tag_facets if first else [],
+                                   result_count=None,
+                                   next_cursor=None,
+                                   static_page=number,
+                                   static_pages=total,
+                                   notice=notice if first else None,
+                                   notice_id=notice['id'] if first and notice else None,
+                                   notice_updated_at=notice['updated_at'] if first and notice else None)
+            write_release_file(release_dir, 'index.html' if first else f'page/{number}.html', html)
+            write_release_file(release_dir, f'page/{number}.part.html',
+                               render_template('_resource_cards.html', resources=resources))
+            body = {
+                'success': True,
+                'resources': [serialize_resource(row) for row in rows],
+                'page': number,
+                'pages': total,
+                'next': f'/api/page/{number + 1}.json' if number < total else None,
+            }
+            write_release_file(release_dir, f'api/page/{number}.json',
+                               json.dumps(body, ensure_ascii=False, separators=(',', ':')))
+
+    # 新建临时链接再 rename 覆盖，current 始终指向一个完整的版本
+    current = os.path.join(PUBLISH_DIR, 'current')
+    temp_link = f'{current}.tmp-{os.getpid()}'
+    if os.path.lexists(temp_link):
+        os.remove(temp_link)
+    os.symlink(os.path.join('releases', release_name), temp_link)
+    os.replace(temp_link, current)
+
+    # 清理旧版本（current 指向的版本总是保留）
+    keep = {os.path.basename(os.readlink(current)), release_name}
+    releases = sorted(os.listdir(releases_dir))
+    for name in releases[:-PUBLISH_KEEP]:
+        if name not in keep:
+            shutil.rmtree(os.path.join(releases_dir, name), ignore_errors=True)
+    return total
+
+def published_response(name):
+    """从当前发布版本读取文件，不存在时返回 None"""
+    path = safe_join(os.path.join(PUBLISH_DIR, 'current'), name)
+    if path is None or not os.path.isfile(path):
+        return None
+    with open(path, 'rb') as f:
+        data = f.read()
+    return app.response_class(data, mimetype=mimetypes.guess_type(name)[0] or 'application/octet-stream')
+
+@app.route('/page/<name>')
+def published_page(name):
+    """已发布的分页（没有前端代理时由 Flask 直接读取发布目录）"""
+    response = published_response(f'page/{name}') if PUBLISH_DIR else None
+    return response or ('Not Found', 404)
+
+@app.route('/api/page/<name>')
+def published_api_page(name):
+    """已发布的分页 JSON"""
+    response = published_response(f'api/page/{name}') if PUBLISH_DIR else None
+    return response or ('Not Found', 404)
+
+# --- 写操作：均在写线程中执行，由 write_queue 统一提交事务 ---
+
+def add_resource(db, values):
+    """新增资源，排在最后"""
+    max_order = db.execute('SELECT MAX(sort_order) FROM resources').fetchone()[0] or 0
+    cursor = db.execute('''
+        INSERT INTO resources (name, r_type, description, tg_link, pan_link, pan_pass, tags, sort_order)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ''', values + (int(max_order) + SORT_GAP,))
+    sync_resource_tags(db, cursor.lastrowid, values[-1])
+    return cursor.lastrowid
+
+def update_resource(db, resource_id, values):
+    """修改资源信息"""
+    db.execute('''
+        UPDATE resources
+        SET name = ?, r_type = ?, description = ?, tg_link = ?, pan_link = ?, pan_pass = ?, tags = ?, updated_at = CURRENT_TIMESTAMP
+        WHERE id = ?
+    ''', values + (resource_id,))
+    sync_resource_tags(db, resource_id, values[-1])
+
+def delete_resource_row(db, resource_id):
+    """删除资源"""
+    db.execute('DELETE FROM resources WHERE id = ?', (resource_id,))
+
+def reorder_resources(db, item_ids):
+    """按提交的顺序重排资源
+
+    管理页面分页加载，提交的只是已加载的部分资源：
+    复用这些资源原有的 sort_order 值重新分配，不影响未加载的资源。
+    提交的资源有已不存在的（例如在其他标签页中被删除）时不做修改，返回 False。
+    """
+    placeholders = ','.join('?' * len(item_ids))
+    cur = db.execute(f'SELECT sort_order FROM resources WHERE id IN ({placeholders}) ORDER BY sort_order', item_ids)
+    orders = [row['sort_order'] or 0 for row in cur.fetchall()]
+    if len(orders) != len(item_ids):
+        # 有资源已被删除（或提交了重复 id），排序值会错位，不做修改
+        return False
+    for i in range(1, len(orders)):
+        orders[i] = max(orders[i], orders[i - 1] + 1)
+    db.executemany('UPDATE resources SET sort_order = ? WHERE id = ?', zip(orders, item_ids))
+    return True
+
+def move_resource_between(db, item_id, before_id, after_id):
+    """移动单个资源，返回 (是否成功, 是否需要后台重排)"""
+    new_order, needs_renumber = rank_between(db, item_id, before_id, after_id)
+    if new_order is None:
+        return False, False
+    db.execute('UPDATE resources SET sort_order = ? WHERE id = ?', (new_order, item_id))
+    return True, needs_renumber
+
+# 批量操作：action -> 说明，value 为类型名或逗号分隔的标签
+BATCH_ACTIONS = {
+    'delete': '删除',
+    'set_type': '设置类型',
+    'add_tags': '添加标签',
+    'remove_tags': '移除标签',
+    'move_top': '移到最前',
+    'move_bottom': '移到最后',
+}
+
+def batch_update_resources(db, item_ids, action, value=''):
+    """批量修改资源（整批在同一个事务中完成），返回受影响的资源数"""
+    params = [(item_id,) for item_id in item_ids]
+    if action == 'delete':
+        return db.executemany('DELETE FROM resources WHERE id = ?', params).rowcount
+
+    if action == 'set_type':
+        return db.executemany('UPDATE resources SET r_type = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?',
+                              [(value,) + param for param in params]).rowcount
+
+    if action in ('add_tags', 'remove_tags'):
+        names = split_tags(value)
+        changed = []
+        for item_id in item_ids:
+            row = db.execute('SELECT tags FROM resources WHERE id = ?', (item_id,)).fetchone()
+            if row is None:
+                continue
+            current = split_tags(row['tags'])
+            if action == 'add_tags':
+                tags = current + [name for name in names if name not in current]
+            else:
+                tags = [name for name in current if name not in names]
+            if tags != current:
+                changed.append((', '.join(tags), item_id))
+        db.executemany('UPDATE resources SET tags = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?', changed)
+        for tags, item_id in changed:
+            sync_resource_tags(db, item_id, tags)
+        return len(changed)
+
+    # 移到最前 / 最后：保持所选资源之间原有的相对顺序
+    placeholders = ','.join('?' * len(item_ids))
+    selected = [row['id'] for row in db.execute(
+        f'SELECT id FROM resources WHERE id IN ({placeholders}) ORDER BY {RESOURCE_ORDER}', item_ids)]
+    if action == 'move_top':
+        first = db.execute('SELECT MIN(sort_order) FROM resources').fetchone()[0] or 0
+        start = math.floor(first) - SORT_GAP * len(selected)
+    else:
+        last = db.execute('SELECT MAX(sort_order) FROM resources').fetchone()[0] or 0
+        start = math.ceil(last) + SORT_GAP
+    db.executemany('UPDATE resources SET sort_order = ? WHERE id = ?',
+                   [(start + i * SORT_GAP, item_id) for i, item_id in enumerate(selected)])
+    return len(selected)
+
+def set_notice_enabled(db, enabled):
+    """切换当前公告的开关"""
+    db.execute('''
+        UPDATE notices
+        SET is_enabled = ?, updated_at = CURRENT_TIMESTAMP
+        WHERE id = (SELECT id FROM notices ORDER BY updated_at DESC LIMIT 1)
+    ''', (1 if enabled else 0,))
+
+def update_notice_content(db, content):
+    """更新当前公告内容，开关状态保持不变"""
+    db.execute('''
+        UPDATE notices
+        SET content = ?, updated_at = CURRENT_TIMESTAMP
+        WHERE id = (SELECT id FROM notices ORDER BY updated_at DESC LIMIT 1)
+    ''', (content,))
+
+@app.route('/admin/700370/metrics')
+def admin_metrics():
+    """Prometheus 格式的请求 / SQL / 模板耗时指标"""
+    response = make_response(metrics.render())
+    response.headers['Content-Type'] = 'text/plain; version=0.0.4; charset=utf-8'
+    return response
 
 @app.route('/admin/notice/toggle', methods=['POST'])
 def toggle_notice():
     """切换公告开关状态"""
     try:
-        if not check_db_tables():
-            return jsonify({'success': False, 'message': '数据库表不存在，已重新初始化'})
-            
         data = request.get_json()
         enabled = data.get('enabled', False)
 
-        db = get_db()  
-        db.execute('''  
-            UPDATE notices   
-            SET is_enabled = ?, updated_at = CURRENT_TIMESTAMP  
-            WHERE id = (SELECT id FROM notices ORDER BY updated_at DESC LIMIT 1)  
-        ''', (1 if enabled else 0,))  
-        db.commit()  
+        write_queue.run(set_notice_enabled, enabled)
           
         return jsonify({'success': True, 'enabled': enabled})  
           
@@ -269,10 +2413,6 @@ def toggle_notice():
 def admin():
     """管理员页面 - 添加和管理资源"""
     try:
-        # 确保数据库表存在
-        if not check_db_tables():
-            flash('数据库已重新初始化', 'info')
-        
         if request.method == 'POST':
             # 处理资源添加
             if 'name' in request.form:
@@ -284,68 +2424,47 @@ def admin():
                 pan_pass = request.form['pan_pass']
                 tags = request.form['tags']
 
-                db = get_db()  
-              
-                try:  
-                    cursor = db.execute('SELECT MAX(sort_order) as max_order FROM resources')  
-                    result = cursor.fetchone()  
-                    max_order = result['max_order'] if result and result['max_order'] is not None else -1  
-                    new_order = max_order + 1  
-                except:  
-                    new_order = 0  
-              
-                db.execute('''  
-                    INSERT INTO resources (name, r_type, description, tg_link, pan_link, pan_pass, tags, sort_order)   
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)  
-                ''', (name, r_type, description, tg_link, pan_link, pan_pass, tags, new_order))  
-                db.commit()  
+                write_queue.run(add_resource, (name, r_type, description, tg_link, pan_link, pan_pass, tags))
                 flash('资源添加成功！', 'success')
               
             # 处理公告更新 - 修复这里
             elif 'notice_content' in request.form:  
                 notice_content = request.form['notice_content']  
                 
-                # 获取当前公告状态，保持开关状态不变
-                db = get_db()
-                cursor = db.execute('SELECT is_enabled FROM notices ORDER BY updated_at DESC LIMIT 1')
-                current_notice = cursor.fetchone()
-                current_enabled = current_notice['is_enabled'] if current_notice else 0
-                
-                db.execute('''  
-                    UPDATE notices   
-                    SET content = ?, is_enabled = ?, updated_at = CURRENT_TIMESTAMP   
-                    WHERE id = (SELECT id FROM notices ORDER BY updated_at DESC LIMIT 1)  
-                ''', (notice_content, current_enabled))  
-                db.commit()  
+                write_queue.run(update_notice_content, notice_content)
                 flash('公告更新成功！', 'success')
           
             return redirect(url_for('admin'))  
       
         # GET请求 - 显示管理页面  
         db = get_db()  
-        cur = db.execute('SELECT * FROM resources ORDER BY sort_order ASC')  
-        resources = cur.fetchall()  
+        resources, next_cursor = list_resources(db, request.args.get('cursor'), ADMIN_PAGE_SIZE)
+
+        # "加载更多" 只返回资源列表片段
+        if request.args.get('partial') == '1':
+            response = make_response(render_template('_admin_items.html', resources=resources))
+            response.headers['X-Next-Cursor'] = next_cursor or ''
+            return response
   
         # 获取当前公告设置  
         notice_cur = db.execute('SELECT * FROM notices ORDER BY updated_at DESC LIMIT 1')  
         notice = notice_cur.fetchone()  
   
-        return render_template('admin.html', resources=resources, form_config=FORM_CONFIG, notice=notice or {})
+        return render_template('admin.html', resources=resources, next_cursor=next_cursor, form_config=FORM_CONFIG, notice=notice or {},
+                               link_summary=link_status_summary(db), batch_actions=BATCH_ACTIONS,
+                               backups=list_backups()[:BACKUP_LIST_SIZE], backup_reasons=BACKUP_REASONS)
         
     except Exception as e:
         print(f"管理员页面错误: {e}")
-        flash('系统错误，正在重新初始化数据库...', 'error')
-        init_db()
-        return redirect(url_for('admin'))
+        if request.method == 'POST':
+            flash(f'保存失败，请重试！{e}', 'danger')
+            return redirect(url_for('admin'))
+        return '系统繁忙，请稍后重试', 503
 
 @app.route('/admin/edit/<int:resource_id>', methods=['GET', 'POST'])
 def edit_resource(resource_id):
     """编辑资源页面"""
     try:
-        if not check_db_tables():
-            flash('数据库已重新初始化', 'info')
-            return redirect(url_for('admin'))
-            
         db = get_db()
 
         if request.method == 'POST':  
@@ -357,12 +2476,7 @@ def edit_resource(resource_id):
             pan_pass = request.form['pan_pass']  
             tags = request.form['tags']  
               
-            db.execute('''  
-                UPDATE resources   
-                SET name = ?, r_type = ?, description = ?, tg_link = ?, pan_link = ?, pan_pass = ?, tags = ?, updated_at = CURRENT_TIMESTAMP   
-                WHERE id = ?  
-            ''', (name, r_type, description, tg_link, pan_link, pan_pass, tags, resource_id))  
-            db.commit()  
+            write_queue.run(update_resource, resource_id, (name, r_type, description, tg_link, pan_link, pan_pass, tags))
             flash('资源更新成功！', 'success')
               
             return redirect(url_for('admin'))  
@@ -376,8 +2490,7 @@ def edit_resource(resource_id):
         return render_template('edit.html', resource=resource, form_config=FORM_CONFIG)
     except Exception as e:
         print(f"编辑资源错误: {e}")
-        flash('系统错误，正在重新初始化数据库...', 'error')
-        init_db()
+        flash(f'保存失败，请重试！{e}', 'danger')
         return redirect(url_for('admin'))
 
 @app.route('/admin/update_order', methods=['POST'])
@@ -388,15 +2501,9 @@ def update_order():
         if not order_data:
             return jsonify({'success': False, 'message': '无效的数据'})
 
-        if not check_db_tables():
-            return jsonify({'success': False, 'message': '数据库表不存在，已重新初始化'})
-
-        db = get_db()  
-      
-        for index, item_id in enumerate(order_data):  
-            db.execute('UPDATE resources SET sort_order = ? WHERE id = ?', (index, int(item_id)))  
-      
-        db.commit()  
+        item_ids = [int(item_id) for item_id in order_data]
+        if not write_queue.run(reorder_resources, item_ids):
+            return jsonify({'success': False, 'message': '部分资源已不存在，请刷新页面'})
       
         return jsonify({'success': True, 'message': '排序更新成功！'})  
       
@@ -404,17 +2511,60 @@ def update_order():
         print(f"更新排序错误: {e}")
         return jsonify({'success': False, 'message': str(e)})
 
+@app.route('/admin/move', methods=['POST'])
+def move_resource():
+    """移动单个资源 - 只更新被移动资源的 sort_order"""
+    try:
+        data = request.get_json() or {}
+        if data.get('id') is None:
+            return jsonify({'success': False, 'message': '无效的数据'})
+
+        item_id = int(data['id'])
+        before_id = int(data['before_id']) if data.get('before_id') is not None else None
+        after_id = int(data['after_id']) if data.get('after_id') is not None else None
+
+        moved, needs_renumber = write_queue.run(move_resource_between, item_id, before_id, after_id)
+        if not moved:
+            return jsonify({'success': False, 'message': '相邻资源不存在，请刷新页面'})
+
+        # 小数排序值的间隔已接近精度极限，后台重新分配间隔
+        if needs_renumber:
+            schedule_renumber()
+
+        return jsonify({'success': True, 'message': '排序更新成功！'})
+
+    except Exception as e:
+        print(f"移动资源错误: {e}")
+        return jsonify({'success': False, 'message': str(e)})
+
+@app.route('/admin/batch', methods=['POST'])
+def batch_resources():
+    """批量删除 / 设置类型 / 增删标签 / 移到最前或最后，一个请求一个事务"""
+    try:
+        data = request.get_json() or {}
+        action = data.get('action')
+        item_ids = list(dict.fromkeys(int(item_id) for item_id in data.get('ids') or []))
+        value = (data.get('value') or '').strip()
+        if action not in BATCH_ACTIONS or not item_ids:
+            return jsonify({'success': False, 'message': '无效的数据'})
+        if len(item_ids) > BATCH_MAX_IDS:
+            return jsonify({'success': False, 'message': f'一次最多处理 {BATCH_MAX_IDS} 条资源'})
+        if action in ('add_tags', 'remove_tags') and not split_tags(value):
+            return jsonify({'success': False, 'message': '请填写标签'})
+
+        count = write_queue.run(batch_update_resources, item_ids, action, value)
+        return jsonify({'success': True, 'count': count,
+                        'message': f'{BATCH_ACTIONS[action]}完成，共 {count} 条资源'})
+
+    except Exception as e:
+        print(f"批量操作错误: {e}")
+        return jsonify({'success': False, 'message': str(e)})
+
 @app.route('/admin/delete/<int:resource_id>', methods=['POST'])
 def delete_resource(resource_id):
     """删除资源"""
     try:
-        if not check_db_tables():
-            flash('数据库已重新初始化', 'info')
-            return redirect(url_for('admin'))
-            
-        db = get_db()
-        db.execute('DELETE FROM resources WHERE id = ?', (resource_id,))
-        db.commit()
+        write_queue.run(delete_resource_row, resource_id)
         flash('资源删除成功！', 'success')
 
         return redirect(url_for('admin'))  
@@ -423,6 +2573,30 @@ def delete_resource(resource_id):
         flash('删除失败，请重试！', 'danger')
         return redirect(url_for('admin'))
 
+def stream_snapshot(snapshot_file, snapshot_path, compress):
+    """分块发送快照文件（可选 gzip），发送结束或连接中断后删除临时文件"""
+    try:
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+        while True:
+            chunk = snapshot_file.read(EXPORT_CHUNK_SIZE)
+            if not chunk:
+                break
+            if compressor:
+                chunk = compressor.compress(chunk)
+                if not chunk:
+                    continue
+            yield chunk
+        if compressor:
+            yield compressor.flush()
+    finally:
+        remove_snapshot(snapshot_file, snapshot_path)
+
+def remove_snapshot(snapshot_file, snapshot_path):
+    """关闭并删除导出用的临时快照"""
+    snapshot_file.close()
+    if os.path.exists(snapshot_path):
+        os.remove(snapshot_path)
+
 @app.route('/admin/export_db')
 def export_db():
     """导出SQLite数据库文件"""
@@ -431,33 +2605,489 @@ def export_db():
             flash('数据库文件不存在！', 'danger')
             return redirect(url_for('admin'))
         
-        if not check_db_tables():
-            flash('数据库表不完整，正在重新初始化...', 'warning')
-            init_db()
-        
-        # 导出的文件名固定为 resources_backup_时间戳.db
+        # 导出的文件名固定为 resources_backup_时间戳.db，可选 gzip 压缩
+        compress = request.args.get('gzip') == '1'
         backup_filename = f'resources_backup_{datetime.now().strftime("%Y%m%d_%H%M%S")}.db'
+        if compress:
+            backup_filename += '.gz'
         
-        # 复制数据库文件到临时位置进行下载
-        backup_path = os.path.join(app.root_path, backup_filename)
-        shutil.copy2(DATABASE, backup_path)
+        # 使用在线备份 API 生成一致性快照；WAL 模式下读事务不阻塞写入
+        fd, snapshot_path = tempfile.mkstemp(prefix='export_', suffix='.db', dir=TEMP_DIR)
+        os.close(fd)
+        try:
+            snapshot = sqlite3.connect(snapshot_path)
+            try:
+                get_db().backup(snapshot)
+            finally:
+                snapshot.close()
+            snapshot_file = open(snapshot_path, 'rb')
+        except Exception:
+            os.remove(snapshot_path)
+            raise
+        release_db()
         
-        return send_file(
-            backup_path, 
-            as_attachment=True, 
-            download_name=backup_filename,  # 这个就是用户下载时看到的文件名
-            mimetype='application/x-sqlite3'
+        response = app.response_class(
+            stream_snapshot(snapshot_file, snapshot_path, compress),
+            mimetype='application/gzip' if compress else 'application/x-sqlite3'
         )
+        response.headers['Content-Disposition'] = f'attachment; filename="{backup_filename}"'  # 这个就是用户下载时看到的文件名
+        if not compress:
+            response.content_length = os.fstat(snapshot_file.fileno()).st_size
+        # 响应未开始发送就被关闭时也要清理临时文件
+        response.call_on_close(lambda: remove_snapshot(snapshot_file, snapshot_path))
+        return response
         
     except Exception as e:
         print(f"导出数据库错误: {e}")
         flash(f'导出数据库失败：{str(e)}', 'danger')
         return redirect(url_for('admin'))
 
+# --- 批量导入 ---
+
+def iter_bulk_rows(stream, fmt):
+    """逐行读取 CSV / JSONL 字节流，生成 (行号, 字段字典或 None, 错误信息)"""
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    if fmt == 'csv':
+        # 表头既可以是字段名，也可以是 FORM_CONFIG 中的中文标签
+        labels = {config['label']: field for field, config in FORM_CONFIG.items()}
+        reader = csv.reader(text)
+        header = next(reader, None)
+        if header is None:
+            return
+        fields = [labels.get(column.strip(), column.strip()) for column in header]
+        for values in reader:
+            if any(value.strip() for value in values):
+                yield reader.line_num, dict(zip(fields, values)), None
+    else:
+        for line_num, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                yield line_num, None, f'JSON 格式错误：{e}'
+                continue
+            if not isinstance(row, dict):
+                yield line_num, None, '每行必须是一个 JSON 对象'
+                continue
+            yield line_num, row, None
+
+def clean_resource_row(row):
+    """按 FORM_CONFIG 校验并整理一行资源数据，返回 (字段值字典, 错误信息)"""
+    values = {}
+    for field, config in FORM_CONFIG.items():
+        value = row.get(field)
+        if isinstance(value, list) and field == 'tags':
+            value = ', '.join(str(tag) for tag in value)
+        value = '' if value is None else str(value).strip()
+        if config.get('required') and not value:
+            return None, f'缺少必填字段 {field}（{config["label"]}）'
+        values[field] = value
+    return values, None
+
+def insert_resource_batch(db, fields, batch):
+    """写线程中插入一批资源并同步标签"""
+    max_id, max_order = db.execute('SELECT COALESCE(MAX(id), 0), COALESCE(MAX(sort_order), 0) FROM resources').fetchone()
+    base_order = int(max_order) + SORT_GAP
+    db.executemany(
+        f'''INSERT INTO resources ({', '.join(fields)}, sort_order)
+           VALUES ({', '.join('?' * len(fields))}, ?)''',
+        [tuple(values[field] for field in fields) + (base_order + i * SORT_GAP,) for i, values in enumerate(batch)]
+    )
+    # 写线程串行执行，新插入的行 id 均大于 max_id，据此同步标签
+    for row in db.execute('SELECT id, tags FROM resources WHERE id > ?', (max_id,)).fetchall():
+        sync_resource_tags(db, row[0], row[1])
+
+def bulk_insert_resources(db, rows):
+    """批量写入资源：按 pan_link 去重，分批 executemany，每批在写线程中一个事务
+
+    rows 为 iter_bulk_rows 生成的 (行号, 字段字典, 错误信息)，返回导入报告。
+    """
+    report = {'inserted': 0, 'duplicates': 0, 'error_count': 0, 'errors': []}
+    fields = list(FORM_CONFIG)
+    seen_links = set()
+
+    def add_error(line_num, message):
+        report['error_count'] += 1
+        if len(report['errors']) < BULK_MAX_ERRORS:
+            report['errors'].append((line_num, message))
+
+    def flush(batch):
+        # 去掉数据库中已存在的下载链接
+        links = [values['pan_link'] for values in batch if values['pan_link']]
+        existing = set()
+        for start in range(0, len(links), 500):
+            chunk = links[start:start + 500]
+            placeholders = ','.join('?' * len(chunk))
+            existing.update(row[0] for row in db.execute(
+                f'SELECT pan_link FROM resources WHERE pan_link IN ({placeholders})', chunk))
+        batch = [values for values in batch if not values['pan_link'] or values['pan_link'] not in existing]
+        report['duplicates'] += len(existing)
+        if not batch:
+            return
+
+        write_queue.run(insert_resource_batch, fields, batch)
+        report['inserted'] += len(batch)
+
+    batch = []
+    for line_num, row, error in rows:
+        if error:
+            add_error(line_num, error)
+            continue
+        values, error = clean_resource_row(row)
+        if error:
+            add_error(line_num, error)
+            continue
+        if values['pan_link']:
+            if values['pan_link'] in seen_links:
+                report['duplicates'] += 1
+                continue
+            seen_links.add(values['pan_link'])
+        batch.append(values)
+        if len(batch) >= BULK_BATCH_SIZE:
+            flush(batch)
+            batch = []
+    if batch:
+        flush(batch)
+    return report
+
+def bulk_format(filename):
+    """根据扩展名判断批量导入文件格式"""
+    ext = os.path.splitext(filename.lower())[1]
+    if ext == '.csv':
+        return 'csv'
+    if ext in ('.jsonl', '.ndjson', '.json'):
+        return 'jsonl'
+    return None
+
+@app.route('/admin/bulk_import', methods=['POST'])
+def bulk_import():
+    """批量导入资源（CSV / JSONL）"""
+    try:
+        file = request.files.get('bulk_file')
+        if not file or file.filename == '':
+            flash('没有选择文件！', 'danger')
+            return redirect(url_for('admin'))
+
+        fmt = bulk_format(file.filename)
+        if fmt is None:
+            flash('只支持 .csv 或 .jsonl 格式的文件！', 'danger')
+            return redirect(url_for('admin'))
+
+        report = bulk_insert_resources(get_db(), iter_bulk_rows(file.stream, fmt))
+        flash(f'批量导入完成：新增 {report["inserted"]} 个资源，跳过重复 {report["duplicates"]} 个，错误 {report["error_count"]} 行', 'success')
+        if report['errors']:
+            details = '；'.join(f'第 {line_num} 行：{message}' for line_num, message in report['errors'][:10])
+            flash(f'以下行未导入 - {details}', 'danger')
+
+    except Exception as e:
+        print(f"批量导入错误: {e}")
+        flash(f'批量导入失败：{str(e)}', 'danger')
+
+    return redirect(url_for('admin'))
+
+@app.cli.command('bulk-import')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']), help='文件格式，默认按扩展名判断')
+def bulk_import_command(path, fmt):
+    """从 CSV / JSONL 文件批量导入资源"""
+    fmt = fmt or bulk_format(path)
+    if fmt is None:
+        raise click.UsageError('无法判断文件格式，请使用 --format 指定')
+
+    with open(path, 'rb') as f:
+        report = bulk_insert_resources(get_db(), iter_bulk_rows(f, fmt))
+    click.echo(f'新增 {report["inserted"]} 个资源，跳过重复 {report["duplicates"]} 个，错误 {report["error_count"]} 行')
+    for line_num, message in report['errors']:
+        click.echo(f'  第 {line_num} 行：{message}', err=True)
+
+def save_upload(file_storage, dest_path):
+    """分块保存上传的数据库文件，先校验 SQLite 文件头，不是数据库文件时尽早放弃"""
+    with open(dest_path, 'wb') as dest:
+        header = file_storage.stream.read(len(SQLITE_HEADER))
+        if header != SQLITE_HEADER:
+            raise ValueError('文件头不是 SQLite 数据库格式')
+        dest.write(header)
+        while True:
+            chunk = file_storage.stream.read(EXPORT_CHUNK_SIZE)
+            if not chunk:
+                break
+            dest.write(chunk)
+
+def prepare_database(path):
+    """离线检查并迁移待导入/恢复的数据库，返回 (资源数, 公告数)"""
+    conn = sqlite3.connect(path, isolation_level=None)
+    try:
+        tables = [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")]
+        missing_tables = [table for table in ('resources', 'notices') if table not in tables]
+        if missing_tables:
+            raise ValueError(f'缺少必要的表：{", ".join(missing_tables)}')
+
+        # 在替换前完成迁移，替换后无需再做结构调整
+        conn.execute('PRAGMA journal_mode = DELETE')
+        migrate_db(conn)
+        conn.execute('BEGIN')
+        rebuild_tag_index(conn)
+        conn.execute('COMMIT')
+
+        resource_count = conn.execute('SELECT COUNT(*) FROM resources').fetchone()[0]
+        notice_count = conn.execute('SELECT COUNT(*) FROM notices').fetchone()[0]
+        return resource_count, notice_count
+    finally:
+        conn.close()
+
+# --- 备份 ---
+
+BACKUP_REASONS = {
+    'manual': '手动备份',
+    'scheduled': '定时备份',
+    'import': '导入前备份',
+    'reset': '重置前备份',
+    'restore': '恢复前备份',
+}
+
+def backup_paths(create=False):
+    """备份目录下的快照对象目录和清单目录；只在写入备份时（create=True）创建目录"""
+    objects = os.path.join(BACKUP_DIR, 'objects')
+    manifests = os.path.join(BACKUP_DIR, 'manifests')
+    if create:
+        os.makedirs(objects, exist_ok=True)
+        os.makedirs(manifests, exist_ok=True)
+    return objects, manifests
+
+def backup_lock():
+    """备份目录的文件锁，多个 worker 同时备份或清理时互斥"""
+    os.makedirs(BACKUP_DIR, exist_ok=True)
+    lock_file = open(os.path.join(BACKUP_DIR, '.lock'), 'w')
+    fcntl.flock(lock_file, fcntl.LOCK_EX)
+    return lock_file
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(EXPORT_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def valid_backup_id(backup_id):
+    """备份 id 格式为 YYYYmmdd_HHMMSS_微秒"""
+    parts = backup_id.split('_')
+    return [len(part) for part in parts] == [8, 6, 6] and all(part.isdigit() for part in parts)
+
+def create_backup(reason='manual'):
+    """用在线备份 API 生成一致性快照存入备份目录，内容未变化时只记录清单，返回备份信息"""
+    objects, manifests = backup_paths(create=True)
+    fd, snapshot_path = tempfile.mkstemp(prefix='backup_', suffix='.db', dir=TEMP_DIR)
+    os.close(fd)
+    try:
+        snapshot = sqlite3.connect(snapshot_path)
+        try:
+            get_db().backup(snapshot)
+            resource_count = snapshot.execute('SELECT COUNT(*) FROM resources').fetchone()[0]
+        finally:
+            snapshot.close()
+
+        # 先计算哈希，相同内容的快照已存在时不再压缩和写入
+        sha256 = file_sha256(snapshot_path)
+        object_path = os.path.join(objects, f'{sha256}.db.gz')
+        with backup_lock():
+            if not os.path.exists(object_path):
+                fd, temp_object = tempfile.mkstemp(prefix='.tmp_', dir=objects)
+                try:
+                    with os.fdopen(fd, 'wb') as raw, gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=GZIP_LEVEL, mtime=0) as dest, \
+                            open(snapshot_path, 'rb') as source:
+                        shutil.copyfileobj(source, dest, EXPORT_CHUNK_SIZE)
+                    os.replace(temp_object, object_path)
+                except Exception:
+                    os.remove(temp_object)
+                    raise
+
+            backup_id = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+            entry = {
+                'id': backup_id,
+                'reason': reason,
+                'sha256': sha256,
+                'size': os.path.getsize(snapshot_path),
+                'stored_size': os.path.getsize(object_path),
+                'resources': resource_count,
+            }
+            manifest_path = os.path.join(manifests, f'{backup_id}.json')
+            with open(manifest_path + '.tmp', 'w', encoding='utf-8') as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(manifest_path + '.tmp', manifest_path)
+            prune_backups()
+        return entry
+    finally:
+        os.remove(snapshot_path)
+
+def list_backups():
+    """所有备份清单，最新的在前"""
+    _, manifests = backup_paths()
+    if not os.path.isdir(manifests):
+        return []  # 还没有备份过
+    entries = []
+    for name in sorted(os.listdir(manifests), reverse=True):
+        if not name.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(manifests, name), encoding='utf-8') as f:
+                entries.append(json.load(f))
+        except (OSError, ValueError) as e:
+            print(f"读取备份清单错误: {name} {e}")
+    return entries
+
+def retained_backups(entries, keep_last=BACKUP_KEEP_LAST, keep_hourly=BACKUP_KEEP_HOURLY, keep_daily=BACKUP_KEEP_DAILY):
+    """按保留策略选出要保留的备份 id：最近 K 份，以及最近 N 个小时 / M 天中各自最新的一份"""
+    keep = {entry['id'] for entry in entries[:max(keep_last, 1)]}
+    hours, days = set(), set()
+    for entry in entries:  # 从新到旧，每个时间段遇到的第一份即最新的一份
+        hour, day = entry['id'][:11], entry['id'][:8]
+        if hour not in hours and len(hours) < keep_hourly:
+            hours.add(hour)
+            keep.add(entry['id'])
+        if day not in days and len(days) < keep_daily:
+            days.add(day)
+            keep.add(entry['id'])
+    return keep
+
+def prune_backups():
+    """删除保留策略之外的清单，以及不再被任何清单引用的快照对象（调用方持有备份锁）"""
+    objects, manifests = backup_paths()
+    entries = list_backups()
+    keep = retained_backups(entries)
+    for entry in entries:
+        if entry['id'] not in keep:
+            os.remove(os.path.join(manifests, f"{entry['id']}.json"))
+    referenced = {entry['sha256'] for entry in entries if entry['id'] in keep}
+    for name in os.listdir(objects):
+        if name.endswith('.db.gz') and name[:-len('.db.gz')] not in referenced:
+            os.remove(os.path.join(objects, name))
+
+def backup_object_path(backup_id):
+    """备份 id 对应的快照对象路径，不存在时返回 None"""
+    if not valid_backup_id(backup_id):
+        return None
+    objects, manifests = backup_paths()
+    try:
+        with open(os.path.join(manifests, f'{backup_id}.json'), encoding='utf-8') as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+    path = os.path.join(objects, f"{entry['sha256']}.db.gz")
+    return path if os.path.exists(path) else None
+
+def restore_backup(backup_id):
+    """把当前数据库恢复为指定备份（恢复前先备份当前数据），返回 (资源数, 公告数)"""
+    object_path = backup_object_path(backup_id)
+    if object_path is None:
+        raise ValueError('备份不存在')
+    fd, temp_path = tempfile.mkstemp(prefix='restore_', suffix='.db', dir=TEMP_DIR)
+    try:
+        with os.fdopen(fd, 'wb') as dest, gzip.open(object_path, 'rb') as source:
+            shutil.copyfileobj(source, dest, EXPORT_CHUNK_SIZE)
+        counts = prepare_database(temp_path)
+        create_backup('restore')
+        replace_database_contents(temp_path)
+        return counts
+    finally:
+        os.remove(temp_path)
+
+def backup_loop():
+    """后台定时备份；多个 worker 通过文件锁保证只有一个进程在运行"""
+    os.makedirs(BACKUP_DIR, exist_ok=True)
+    lock_file = open(os.path.join(BACKUP_DIR, '.scheduler.lock'), 'w')
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return
+    while True:
+        time.sleep(BACKUP_INTERVAL)
+        try:
+            with app.app_context():
+                create_backup('scheduled')
+        except Exception as e:
+            print(f"定时备份错误: {e}")
+
+def start_backup_scheduler():
+    """BACKUP_INTERVAL 大于 0 时启动定时备份线程"""
+    if BACKUP_INTERVAL > 0:
+        threading.Thread(target=backup_loop, name='backup-scheduler', daemon=True).start()
+
+@app.route('/admin/backups', methods=['POST'])
+def backup_now():
+    """立即备份当前数据库"""
+    try:
+        entry = create_backup('manual')
+        flash(f"备份完成：{entry['resources']} 个资源，占用 {entry['stored_size'] // 1024} KB", 'success')
+    except Exception as e:
+        print(f"备份错误: {e}")
+        flash(f'备份失败：{str(e)}', 'danger')
+    return redirect(url_for('admin'))
+
+@app.route('/admin/backups/<backup_id>/download')
+def download_backup(backup_id):
+    """下载 gzip 压缩的备份"""
+    object_path = backup_object_path(backup_id)
+    if object_path is None:
+        flash('备份不存在！', 'danger')
+        return redirect(url_for('admin'))
+    return send_file(os.path.abspath(object_path), mimetype='application/gzip', as_attachment=True,
+                     download_name=f'resources_backup_{backup_id}.db.gz')
+
+@app.route('/admin/backups/<backup_id>/restore', methods=['POST'])
+def restore_backup_route(backup_id):
+    """从备份恢复数据库"""
+    try:
+        resource_count, notice_count = restore_backup(backup_id)
+        flash(f'已恢复到备份 {backup_id}！包含 {resource_count} 个资源和 {notice_count} 个公告，恢复前的数据已自动备份', 'success')
+    except ValueError as e:
+        flash(f'无法恢复：{str(e)}', 'danger')
+    except Exception as e:
+        print(f"恢复备份错误: {e}")
+        flash(f'恢复备份失败：{str(e)}', 'danger')
+    return redirect(url_for('admin'))
+
+@app.cli.command('backup')
+@click.option('--list', 'show', is_flag=True, help='列出已有备份')
+def backup_command(show):
+    """备份当前数据库（适合放在 cron 中定时执行）"""
+    if show:
+        for entry in list_backups():
+            click.echo(f"{entry['id']}  {BACKUP_REASONS.get(entry['reason'], entry['reason'])}  "
+                       f"{entry['resources']} 个资源  {entry['stored_size'] // 1024} KB  {entry['sha256'][:12]}")
+        return
+    init_db()
+    entry = create_backup('scheduled')
+    click.echo(f"备份完成: {entry['id']} ({entry['stored_size'] // 1024} KB)")
+
+def replace_database_contents(source_path):
+    """用 source_path 的内容整体替换当前数据库
+
+    通过在线备份 API 在一个写事务内写入当前数据库文件，不删除或移动文件：
+    其他连接（包括其他进程）无需关闭，提交前读到旧数据，提交后读到新数据。
+    """
+    live = get_db()
+    source = sqlite3.connect(source_path, isolation_level=None)
+    try:
+        page_size = live.execute('PRAGMA page_size').fetchone()[0]
+        if source.execute('PRAGMA page_size').fetchone()[0] != page_size:
+            # WAL 模式下目标库页大小不可变，先把源库转换为相同页大小
+            source.execute(f'PRAGMA page_size = {int(page_size)}')
+            source.execute('VACUUM')
+        # 整库替换后变更日志不再连续，更换 epoch 让订阅方重新全量同步
+        source.execute('UPDATE feed_state SET epoch = ?', (secrets.token_hex(8),))
+        source.backup(live)
+    finally:
+        source.close()
+    bump_generation()
+    schedule_publish()
+
 @app.route('/admin/import_db', methods=['POST'])
 def import_db():
     """导入SQLite数据库文件"""
     temp_path = None
+    original_name = ''
     try:
         if 'db_file' not in request.files:
             flash('没有选择文件！', 'danger')
@@ -477,111 +3107,27 @@ def import_db():
         original_name = os.path.splitext(file.filename)[0]
         
         # 保存上传的文件到临时位置
-        temp_path = os.path.join(app.root_path, 'temp_import.db')
-        
-        # 删除可能存在的临时文件
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
-        
-        file.save(temp_path)
+        fd, temp_path = tempfile.mkstemp(prefix='import_', suffix='.db', dir=TEMP_DIR)
+        os.close(fd)
+        save_upload(file, temp_path)
         
-        # 验证上传的文件是否为有效的SQLite数据库
-        try:
-            test_conn = sqlite3.connect(temp_path)
-            test_cursor = test_conn.cursor()
-            
-            # 检查必要的表是否存在
-            test_cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
-            tables = [row[0] for row in test_cursor.fetchall()]
-            
-            print(f"数据库 '{original_name}' 中的表: {tables}")
-            
-            required_tables = ['resources', 'notices']
-            missing_tables = [table for table in required_tables if table not in tables]
-            
-            if missing_tables:
-                test_conn.close()
-                os.remove(temp_path)
-                flash(f'数据库文件 "{original_name}" 缺少必要的表：{", ".join(missing_tables)}', 'danger')
-                return redirect(url_for('admin'))
-            
-            # 检查表结构是否正确
-            try:
-                test_cursor.execute("SELECT * FROM resources LIMIT 1")
-                test_cursor.execute("SELECT * FROM notices LIMIT 1")
-                
-                # 获取数据统计
-                test_cursor.execute("SELECT COUNT(*) FROM resources")
-                resource_count = test_cursor.fetchone()[0]
-                test_cursor.execute("SELECT COUNT(*) FROM notices")
-                notice_count = test_cursor.fetchone()[0]
-                
-            except sqlite3.Error as e:
-                test_conn.close()
-                os.remove(temp_path)
-                flash(f'数据库 "{original_name}" 表结构不正确：{str(e)}', 'danger')
-                return redirect(url_for('admin'))
-            
-            test_conn.close()
-            
-        except sqlite3.Error as e:
-            if temp_path and os.path.exists(temp_path):
-                os.remove(temp_path)
-            flash(f'文件 "{original_name}" 不是有效的SQLite数据库：{str(e)}', 'danger')
-            return redirect(url_for('admin'))
+        # 验证表结构并完成迁移
+        resource_count, notice_count = prepare_database(temp_path)
+        print(f"数据库 '{original_name}' 包含 {resource_count} 个资源和 {notice_count} 个公告")
         
         # 备份当前数据库
-        backup_filename = f'current_backup_{datetime.now().strftime("%Y%m%d_%H%M%S")}.db'
-        backup_path = os.path.join(app.root_path, backup_filename)
-        if os.path.exists(DATABASE):
-            shutil.copy2(DATABASE, backup_path)
+        backup = create_backup('import')
         
-        try:
-            # 关闭所有数据库连接并替换数据库文件
-            db = getattr(g, '_database', None)
-            if db:
-                db.close()
-                g._database = None
-            
-            # 删除当前的 resources.db
-            if os.path.exists(DATABASE):
-                os.remove(DATABASE)
-            
-            # 将上传的文件重命名为 resources.db 并移动到正确位置
-            shutil.move(temp_path, DATABASE)
-            temp_path = None  # 标记文件已移动，避免后续删除
-            
-            # 最终验证新数据库是否可用
-            new_conn = sqlite3.connect(DATABASE)
-            new_cursor = new_conn.cursor()
-            
-            # 再次检查表
-            new_cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
-            tables = [row[0] for row in new_cursor.fetchall()]
-            
-            if 'resources' not in tables or 'notices' not in tables:
-                new_conn.close()
-                # 恢复备份
-                if os.path.exists(backup_path):
-                    shutil.copy2(backup_path, DATABASE)
-                flash('导入失败：数据库缺少必要的表，已恢复原数据库', 'danger')
-                return redirect(url_for('admin'))
-            
-            # 验证数据完整性
-            new_cursor.execute("SELECT COUNT(*) FROM resources")
-            final_resource_count = new_cursor.fetchone()[0]
-            new_cursor.execute("SELECT COUNT(*) FROM notices")
-            final_notice_count = new_cursor.fetchone()[0]
-            new_conn.close()
-            
-            flash(f'数据库 "{original_name}" 导入成功！已自动重命名为 resources.db。包含 {final_resource_count} 个资源和 {final_notice_count} 个公告。原数据库已备份为 {backup_filename}', 'success')
-            
-        except Exception as e:
-            # 如果导入失败，恢复备份
-            if os.path.exists(backup_path):
-                shutil.copy2(backup_path, DATABASE)
-            raise e
+        # 写入当前数据库，失败时事务回滚，原数据保持不变
+        replace_database_contents(temp_path)
+        
+        flash(f'数据库 "{original_name}" 导入成功！包含 {resource_count} 个资源和 {notice_count} 个公告。原数据库已备份为 {backup["id"]}', 'success')
         
+    except ValueError as e:
+        flash(f'数据库 "{original_name}" 无法导入：{str(e)}', 'danger')
+    except sqlite3.DatabaseError as e:
+        print(f"导入数据库错误: {e}")
+        flash(f'文件 "{original_name}" 不是有效的SQLite数据库：{str(e)}', 'danger')
     except Exception as e:
         print(f"导入数据库错误: {e}")
         flash(f'导入数据库失败：{str(e)}', 'danger')
@@ -596,39 +3142,54 @@ def import_db():
 @app.route('/admin/reset_db', methods=['POST'])
 def reset_db():
     """重置数据库"""
+    temp_path = None
     try:
         if request.form.get('confirm') != 'RESET_DATABASE':
             flash('无效的重置请求！', 'danger')
             return redirect(url_for('admin'))
         
         # 备份当前数据库
-        backup_filename = f'reset_backup_{datetime.now().strftime("%Y%m%d_%H%M%S")}.db'
-        backup_path = os.path.join(app.root_path, backup_filename)
-        if os.path.exists(DATABASE):
-            shutil.copy2(DATABASE, backup_path)
-        
-        # 关闭当前连接
-        db = getattr(g, '_database', None)
-        if db:
-            db.close()
-            g._database = None
+        backup = create_backup('reset')
         
-        # 删除数据库文件，强制重新初始化
-        if os.path.exists(DATABASE):
-            os.remove(DATABASE)
-        
-        # 重新初始化数据库
-        init_db()
+        # 创建一个全新的数据库并整体替换当前数据库
+        fd, temp_path = tempfile.mkstemp(prefix='reset_', suffix='.db', dir=TEMP_DIR)
+        os.close(fd)
+        conn = sqlite3.connect(temp_path, isolation_level=None)
+        try:
+            migrate_db(conn)
+        finally:
+            conn.close()
+        replace_database_contents(temp_path)
         
-        flash('数据库重置成功！原有数据库已备份为 ' + backup_filename, 'success')
+        flash('数据库重置成功！原有数据库已备份为 ' + backup['id'], 'success')
         
     except Exception as e:
         print(f"重置数据库错误: {e}")
         flash('重置数据库失败！', 'danger')
     
+    finally:
+        if temp_path and os.path.exists(temp_path):
+            os.remove(temp_path)
+    
     return redirect(url_for('admin'))
 
+def warm_up():
+    """启动预热：检查数据库结构，预编译模板并填充首页缓存，静态发布模式下发布一次"""
+    init_db()
+    start_link_checker()
+    start_backup_scheduler()
+    if PUBLISH_DIR and claim_startup_publish():
+        with _publish_lock:
+            publish_site()
+    with app.test_client() as client:
+        client.get('/')
+        client.get('/api/resources')
+
 if __name__ == '__main__':
-    print("启动本地开发服务器...")
+    # 生产环境请使用 gunicorn -c gunicorn.conf.py app:app；调试模式需设置 FLASK_DEBUG=1
+    debug = os.environ.get('FLASK_DEBUG') == '1'
+    print("启动本地开发服务器..." + ("（调试模式）" if debug else ""))
     init_db()
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    start_link_checker()
+    start_backup_scheduler()
+    app.run(debug=debug, host='0.0.0.0', port=int(os.environ.get('PORT', 5000)), threaded=True)
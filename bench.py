@@ -0,0 +1,291 @@
+"""资源站基准测试 / 压测脚本
+
+为每个数据规模生成一个合成数据库，分别通过 Flask 测试客户端和本地 HTTP
+并发压测驱动主要路由，统计 p50/p95/p99 延迟、吞吐量和内存，结果写入
+JSON 文件，方便不同版本之间对比。
+
+用法：
+    python bench.py                            # 默认规模 1k,10k,100k,1M
+    python bench.py --sizes 1000,10000 --requests 200 --concurrency 16
+    python bench.py --compare old.json new.json
+
+每个数据规模在单独的子进程中运行，进程峰值内存（process_peak_rss_mb）互不影响；
+每个场景另外记录开始时的常驻内存、场景期间的峰值及其增长（rss_start_mb / rss_peak_mb / rss_delta_mb）。
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+DEFAULT_SIZES = [1000, 10000, 100000, 1000000]
+WORDS = ['Python', '教程', '电影', '工具', '合集', '高清', '中文', '破解版', '文档', '入门',
+         'Linux', '游戏', '音乐', '设计', '素材', '系统', '源码', '课程', '字幕', '纪录片']
+TAGS = ['软件', '影视', '学习', '游戏', '文档', '设计', '音乐', '系统', '编程', '工具']
+TYPES = ['软件工具', '影视资源', '学习教程', '游戏资源', '文档资料']
+
+def seed_database(path, size, seed=42):
+    """生成包含 size 条资源的合成数据库"""
+    import app as site
+
+    site.DATABASE = path
+    site.SEARCH_RATE = 0  # 压测客户端都来自本机，关闭搜索限流
+    site.BACKUP_DIR = os.path.join(os.path.dirname(path), 'backups')  # 管理页面会读取备份目录，放在临时目录中
+    site.db_pool = site.ConnectionPool(path)
+    site.init_db()
+
+    rnd = random.Random(seed)
+    db = site.db_pool.acquire()
+    try:
+        db.execute('BEGIN IMMEDIATE')
+        batch = []
+        for i in range(1, size + 1):
+            name = ' '.join(rnd.sample(WORDS, 3)) + f' {i}'
+            tags = ', '.join(rnd.sample(TAGS, rnd.randint(1, 3)))
+            batch.append((name, rnd.choice(TYPES), f'{name} 的资源描述', '', f'https://pan.example.com/s/{i}',
+                          '', tags, i * site.SORT_GAP))
+            if len(batch) >= 10000:
+                db.executemany('''INSERT INTO resources (name, r_type, description, tg_link, pan_link, pan_pass, tags, sort_order)
+                                  VALUES (?, ?, ?, ?, ?, ?, ?, ?)''', batch)
+                batch = []
+        if batch:
+            db.executemany('''INSERT INTO resources (name, r_type, description, tg_link, pan_link, pan_pass, tags, sort_order)
+                              VALUES (?, ?, ?, ?, ?, ?, ?, ?)''', batch)
+        site.rebuild_tag_index(db)
+        db.commit()
+        db.execute('ANALYZE')
+    finally:
+        site.db_pool.release(db)
+    site.bump_generation()
+    return site
+
+def build_scenarios(site, size):
+    """场景列表：(名称, 方法, 路径, 请求体, 是否清空页面缓存)"""
+    db = site.db_pool.acquire()
+    try:
+        rows, cursor = site.list_resources(db, limit=site.PAGE_SIZE)
+        first_page = [row['id'] for row in rows]
+    finally:
+        site.db_pool.release(db)
+
+    middle = size // 2
+    return [
+        ('index', 'GET', '/', None, False),
+        ('index_cold', 'GET', '/', None, True),
+        ('index_page2', 'GET', f'/?partial=1&cursor={cursor}', None, True),
+        ('search_fts', 'GET', '/?q=' + urllib.request.quote('破解版'), None, True),  # 3 个字符以上走全文索引
+        ('search_short', 'GET', '/?q=' + urllib.request.quote('影'), None, True),
+        ('tag_filter', 'GET', '/?tag=' + urllib.request.quote('编程'), None, True),
+        ('api_list', 'GET', '/api/resources?limit=50', None, True),
+        ('admin', 'GET', '/admin/700370', None, True),
+        ('update_order', 'POST', '/admin/update_order', list(reversed(first_page)), False),
+        ('move', 'POST', '/admin/move', {'id': middle, 'before_id': first_page[0], 'after_id': first_page[1]}, False),
+    ]
+
+def percentiles(samples):
+    """计算延迟分位数（毫秒）"""
+    ordered = sorted(samples)
+    pick = lambda p: ordered[min(len(ordered) - 1, int(len(ordered) * p))] * 1000
+    return {'p50_ms': round(pick(0.50), 3), 'p95_ms': round(pick(0.95), 3),
+            'p99_ms': round(pick(0.99), 3), 'max_ms': round(ordered[-1] * 1000, 3)}
+
+def peak_rss_mb():
+    """进程启动以来的峰值常驻内存（MB，Linux 下 ru_maxrss 单位为 KB）"""
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+def current_rss_mb():
+    """当前常驻内存（MB，读取 /proc/self/statm；不支持的系统返回 None）"""
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return pages * os.sysconf('SC_PAGE_SIZE') / 1024 / 1024
+
+class RssSampler:
+    """场景执行期间在后台线程中定时采样当前常驻内存
+
+    ru_maxrss 是整个进程至今的峰值，后面的场景只会沿用前面的最大值；
+    这里记录场景开始时的内存和场景期间的峰值，两者之差才是该场景自身的内存增长。
+    """
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.start = self.peak = current_rss_mb()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def _sample(self):
+        rss = current_rss_mb()
+        if rss is not None:
+            self.peak = max(self.peak or 0, rss)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+
+    def stats(self):
+        if self.start is None:
+            return {'rss_start_mb': None, 'rss_peak_mb': None, 'rss_delta_mb': None}
+        return {'rss_start_mb': round(self.start, 1), 'rss_peak_mb': round(self.peak, 1),
+                'rss_delta_mb': round(self.peak - self.start, 1)}
+
+def run_test_client(site, scenarios, requests):
+    """通过 Flask 测试客户端串行驱动各个路由"""
+    client = site.app.test_client()
+    results = {}
+    for name, method, path, body, cold in scenarios:
+        samples = []
+        started = time.perf_counter()
+        with RssSampler() as rss:
+            for _ in range(requests):
+                if cold:
+                    site.bump_generation()
+                t0 = time.perf_counter()
+                resp = client.open(path, method=method, json=body)
+                samples.append(time.perf_counter() - t0)
+                if resp.status_code >= 400:
+                    raise RuntimeError(f'{name} 返回 {resp.status_code}')
+        elapsed = time.perf_counter() - started
+        results[name] = dict(percentiles(samples), requests=requests,
+                             throughput_rps=round(requests / elapsed, 1), **rss.stats())
+    return results
+
+def run_http_load(site, scenarios, requests, concurrency):
+    """启动本地多线程 HTTP 服务，用并发客户端压测各个路由"""
+    from werkzeug.serving import make_server
+
+    server = make_server('127.0.0.1', 0, site.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f'http://127.0.0.1:{server.server_port}'
+
+    def fetch(method, path, body):
+        data = json.dumps(body).encode() if body is not None else None
+        req = urllib.request.Request(base + path, data=data, method=method,
+                                     headers={'Content-Type': 'application/json'} if data else {})
+        t0 = time.perf_counter()
+        with urllib.request.urlopen(req) as resp:
+            resp.read()
+        return time.perf_counter() - t0
+
+    results = {}
+    try:
+        for name, method, path, body, cold in scenarios:
+            if cold:
+                site.bump_generation()
+            started = time.perf_counter()
+            with RssSampler() as rss, ThreadPoolExecutor(max_workers=concurrency) as pool:
+                samples = list(pool.map(lambda _: fetch(method, path, body), range(requests)))
+            elapsed = time.perf_counter() - started
+            results[name] = dict(percentiles(samples), requests=requests, concurrency=concurrency,
+                                 throughput_rps=round(requests / elapsed, 1), **rss.stats())
+    finally:
+        server.shutdown()
+    return results
+
+def run_size(size, requests, concurrency, workdir):
+    """子进程中执行：生成数据库并运行全部场景"""
+    path = os.path.join(workdir, f'bench_{size}.db')
+    t0 = time.perf_counter()
+    site = seed_database(path, size)
+    seed_seconds = time.perf_counter() - t0
+
+    scenarios = build_scenarios(site, size)
+    result = {
+        'size': size,
+        'seed_seconds': round(seed_seconds, 2),
+        'db_bytes': os.path.getsize(path),
+        'test_client': run_test_client(site, scenarios, requests),
+        'http': run_http_load(site, scenarios, requests, concurrency),
+        'process_peak_rss_mb': peak_rss_mb(),  # 整个子进程（含生成数据）的峰值
+    }
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    shutil.rmtree(site.BACKUP_DIR, ignore_errors=True)
+    return result
+
+def compare(old_path, new_path, threshold):
+    """对比两次结果，列出 p95 变慢超过阈值的场景"""
+    with open(old_path, encoding='utf-8') as f:
+        old = {run['size']: run for run in json.load(f)['runs']}
+    with open(new_path, encoding='utf-8') as f:
+        new = {run['size']: run for run in json.load(f)['runs']}
+
+    regressions = 0
+    for size in sorted(set(old) & set(new)):
+        for mode in ('test_client', 'http'):
+            for name, stats in new[size][mode].items():
+                before = old[size][mode].get(name)
+                if not before:
+                    continue
+                ratio = stats['p95_ms'] / max(before['p95_ms'], 1e-6)
+                flag = '  <-- 变慢' if ratio > 1 + threshold else ''
+                regressions += bool(flag)
+                print(f'{size:>8} {mode:<11} {name:<14} p95 {before["p95_ms"]:>9.2f} -> {stats["p95_ms"]:>9.2f} ms{flag}')
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='资源站基准测试')
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)), help='数据规模，逗号分隔')
+    parser.add_argument('--requests', type=int, default=100, help='每个场景的请求数')
+    parser.add_argument('--concurrency', type=int, default=8, help='HTTP 压测并发客户端数')
+    parser.add_argument('--output', default=f'bench_{datetime.now():%Y%m%d_%H%M%S}.json', help='结果 JSON 文件')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help='对比两次结果')
+    parser.add_argument('--threshold', type=float, default=0.2, help='对比时 p95 变慢超过该比例视为回归')
+    parser.add_argument('--worker', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--workdir', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.compare:
+        sys.exit(1 if compare(*args.compare, args.threshold) else 0)
+
+    if args.worker:
+        result = run_size(args.worker, args.requests, args.concurrency, args.workdir)
+        print(json.dumps(result))
+        return
+
+    workdir = tempfile.mkdtemp(prefix='bench_')
+    runs = []
+    for size in [int(s) for s in args.sizes.split(',') if s.strip()]:
+        print(f'>>> 规模 {size} ...', file=sys.stderr)
+        proc = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--worker', str(size), '--workdir', workdir,
+             '--requests', str(args.requests), '--concurrency', str(args.concurrency)],
+            cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True)
+        if proc.returncode != 0:
+            print(proc.stderr, file=sys.stderr)
+            sys.exit(proc.returncode)
+        run = json.loads(proc.stdout.strip().splitlines()[-1])
+        runs.append(run)
+        for name, stats in run['test_client'].items():
+            print(f'{size:>8} {name:<14} p50 {stats["p50_ms"]:>8.2f}  p95 {stats["p95_ms"]:>8.2f}  '
+                  f'p99 {stats["p99_ms"]:>8.2f} ms  {stats["throughput_rps"]:>8.1f} req/s  '
+                  f'场景内存增长 {stats["rss_delta_mb"]} MB', file=sys.stderr)
+    os.rmdir(workdir)
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump({'created_at': datetime.now().isoformat(timespec='seconds'), 'python': sys.version.split()[0],
+                   'requests': args.requests, 'concurrency': args.concurrency, 'runs': runs}, f, ensure_ascii=False, indent=2)
+    print(f'结果已写入 {args.output}')
+
+if __name__ == '__main__':
+    main()
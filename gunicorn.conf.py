@@ -0,0 +1,52 @@
+"""gunicorn 生产环境配置
+
+启动：gunicorn -c gunicorn.conf.py app:app
+平滑重载（重新加载代码、逐个替换 worker）：kill -HUP <master pid>
+"""
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+bind = os.environ.get('BIND', '0.0.0.0:5000')
+
+# 多进程 + 每进程多线程：读请求随 CPU 核数扩展，SQLite WAL 下读写互不阻塞
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+threads = int(os.environ.get('WEB_THREADS', 4))
+# 注意：/api/changes/stream 的每个 SSE 连接最长占用一个线程 300 秒，长轮询最长 30 秒；
+# 每个进程同时保持的 SSE 连接数由 SSE_MAX_STREAMS 限制（默认线程数的一半），订阅方较多时应增加 WEB_THREADS
+worker_class = 'gthread'
+
+# 不预加载：HUP 重载时 worker 重新导入 app.py，连接池也不会跨 fork 共享
+preload_app = False
+graceful_timeout = 30
+timeout = 60
+keepalive = 5
+
+# 定期回收 worker，避免长期运行的内存增长
+max_requests = int(os.environ.get('MAX_REQUESTS', 10000))
+max_requests_jitter = max_requests // 10
+
+accesslog = '-'
+errorlog = '-'
+loglevel = os.environ.get('LOG_LEVEL', 'info')
+
+# 各 worker 共享的指标目录：/admin/700370/metrics 合并所有 worker 的计数，未指定时由 master 创建临时目录
+metrics_tmp_dir = None
+
+def on_starting(server):
+    """master 启动时（fork worker 之前）设置 METRICS_DIR，worker 通过环境变量继承"""
+    global metrics_tmp_dir
+    if not os.environ.get('METRICS_DIR'):
+        metrics_tmp_dir = tempfile.mkdtemp(prefix='jb-metrics-')
+        os.environ['METRICS_DIR'] = metrics_tmp_dir
+
+def on_exit(server):
+    """master 退出时删除自动创建的指标目录"""
+    if metrics_tmp_dir:
+        shutil.rmtree(metrics_tmp_dir, ignore_errors=True)
+
+def post_worker_init(worker):
+    """worker 开始接收请求前预热：检查数据库结构，预编译模板并填充首页缓存"""
+    from app import warm_up
+    warm_up()
@@ -0,0 +1,205 @@
+document.addEventListener('DOMContentLoaded', function() {
+    const resourceList = document.getElementById('resourceList');
+    const saveIndicator = document.getElementById('saveIndicator');
+    const noticeSwitch = document.getElementById('noticeSwitch');
+    const switchStatus = document.getElementById('switchStatus');
+
+    // 公告开关控制
+    noticeSwitch.addEventListener('change', function() {
+        const enabled = this.checked;
+
+        fetch('/admin/notice/toggle', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({ enabled: enabled })
+        })
+        .then(response => response.json())
+        .then(data => {
+            if (data.success) {
+                // 更新状态显示
+                if (enabled) {
+                    switchStatus.textContent = '已开启';
+                    switchStatus.className = 'switch-status status-enabled';
+                } else {
+                    switchStatus.textContent = '已关闭';
+                    switchStatus.className = 'switch-status status-disabled';
+                }
+            } else {
+                alert('操作失败：' + data.message);
+                // 恢复开关状态
+                this.checked = !enabled;
+            }
+        })
+        .catch(error => {
+            console.error('Error:', error);
+            alert('操作时出错，请重试');
+            this.checked = !enabled;
+        });
+    });
+
+    // 加载更多资源，追加到可拖拽列表末尾
+    const loadMoreBtn = document.getElementById('loadMore');
+    if (loadMoreBtn) {
+        loadMoreBtn.addEventListener('click', function() {
+            const button = this;
+            button.textContent = '加载中...';
+            fetch('/admin/700370?partial=1&cursor=' + encodeURIComponent(button.dataset.cursor))
+            .then(response => {
+                const nextCursor = response.headers.get('X-Next-Cursor');
+                return response.text().then(html => ({ html, nextCursor }));
+            })
+            .then(({ html, nextCursor }) => {
+                resourceList.insertAdjacentHTML('beforeend', html);
+                if (nextCursor) {
+                    button.dataset.cursor = nextCursor;
+                    button.textContent = '加载更多';
+                } else {
+                    button.remove();
+                }
+            })
+            .catch(error => {
+                console.error('Error:', error);
+                button.textContent = '加载失败，点击重试';
+            });
+        });
+    }
+
+    // 批量操作：勾选资源后一次提交，整批在同一个事务中完成
+    const batchSelectAll = document.getElementById('batchSelectAll');
+    const batchCount = document.getElementById('batchCount');
+    const batchAction = document.getElementById('batchAction');
+    const batchValue = document.getElementById('batchValue');
+    const batchApply = document.getElementById('batchApply');
+
+    function selectedItems() {
+        return Array.from(resourceList.querySelectorAll('.batch-select:checked')).map(box => box.closest('.resource-item'));
+    }
+
+    function updateBatchCount() {
+        batchCount.textContent = '已选 ' + selectedItems().length + ' 条';
+    }
+
+    if (batchApply) {
+        resourceList.addEventListener('change', function(event) {
+            if (event.target.classList.contains('batch-select')) {
+                updateBatchCount();
+            }
+        });
+
+        batchSelectAll.addEventListener('change', function() {
+            resourceList.querySelectorAll('.batch-select').forEach(box => { box.checked = this.checked; });
+            updateBatchCount();
+        });
+
+        batchApply.addEventListener('click', function() {
+            const items = selectedItems();
+            const action = batchAction.value;
+            const label = batchAction.options[batchAction.selectedIndex].text;
+            if (!items.length) {
+                alert('请先勾选资源');
+                return;
+            }
+            if (!confirm('确定要对选中的 ' + items.length + ' 条资源执行「' + label + '」吗？')) {
+                return;
+            }
+
+            batchApply.disabled = true;
+            fetch('/admin/batch', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                },
+                body: JSON.stringify({
+                    action: action,
+                    ids: items.map(item => item.dataset.id),
+                    value: batchValue.value
+                })
+            })
+            .then(response => response.json())
+            .then(data => {
+                if (!data.success) {
+                    alert('操作失败：' + data.message);
+                    return;
+                }
+                // 按操作结果直接更新列表，不重新加载页面
+                if (action === 'delete') {
+                    items.forEach(item => item.remove());
+                } else if (action === 'move_top') {
+                    items.slice().reverse().forEach(item => resourceList.prepend(item));
+                } else if (action === 'move_bottom') {
+                    items.forEach(item => resourceList.append(item));
+                } else if (action === 'set_type') {
+                    items.forEach(item => {
+                        let type = item.querySelector('.resource-type');
+                        if (!type) {
+                            type = document.createElement('div');
+                            type.className = 'resource-type';
+                            item.querySelector('.resource-name').after(type);
+                        }
+                        type.textContent = batchValue.value.trim();
+                    });
+                }
+                items.forEach(item => {
+                    const box = item.querySelector('.batch-select');
+                    if (box) {
+                        box.checked = false;
+                    }
+                });
+                batchSelectAll.checked = false;
+                updateBatchCount();
+                alert(data.message);
+            })
+            .catch(error => {
+                console.error('Error:', error);
+                alert('批量操作时出错，请重试');
+            })
+            .finally(() => {
+                batchApply.disabled = false;
+            });
+        });
+    }
+
+    if (resourceList) {
+        new Sortable(resourceList, {
+            animation: 150,
+            ghostClass: 'sortable-ghost',
+            dragClass: 'sortable-drag',
+            handle: '.drag-handle',
+            onUpdate: function(evt) {
+                // 只提交被移动的资源及其前后相邻的资源
+                const item = evt.item;
+                const prev = item.previousElementSibling;
+                const next = item.nextElementSibling;
+
+                fetch('/admin/move', {
+                    method: 'POST',
+                    headers: {
+                        'Content-Type': 'application/json',
+                    },
+                    body: JSON.stringify({
+                        id: item.dataset.id,
+                        before_id: prev ? prev.dataset.id : null,
+                        after_id: next ? next.dataset.id : null
+                    })
+                })
+                .then(response => response.json())
+                .then(data => {
+                    if (data.success) {
+                        saveIndicator.style.display = 'block';
+                        setTimeout(() => {
+                            saveIndicator.style.display = 'none';
+                        }, 2000);
+                    } else {
+                        alert('保存失败：' + data.message);
+                    }
+                })
+                .catch(error => {
+                    console.error('Error:', error);
+                    alert('保存排序时出错，请重试');
+                });
+            }
+        });
+    }
+});
@@ -0,0 +1,172 @@
+// 当前公告的唯一键，没有公告时为空
+function getNoticeKey() {
+    const noticeOverlay = document.getElementById('noticeOverlay');
+    return noticeOverlay ? noticeOverlay.dataset.noticeKey : '';
+}
+
+// 检查是否应该显示公告
+function shouldShowNotice() {
+    // 从模板中获取当前公告的唯一键
+    const noticeKey = getNoticeKey();
+    if (noticeKey) {
+        const hideNotice = localStorage.getItem(noticeKey);
+        if (hideNotice === 'true') {
+            return false;
+        }
+    }
+    return true;
+}
+
+// 关闭公告弹窗（本次访问）
+function closeNotice() {
+    const noticeOverlay = document.getElementById('noticeOverlay');
+    if (noticeOverlay) {
+        // 添加关闭动画
+        const modal = noticeOverlay.querySelector('.notice-modal');
+        modal.style.animation = 'slideUp 0.3s ease reverse';
+
+        setTimeout(() => {
+            noticeOverlay.style.animation = 'fadeIn 0.3s ease reverse';
+        }, 100);
+
+        setTimeout(() => {
+            noticeOverlay.remove();
+            document.body.style.overflow = 'auto';
+        }, 400);
+    }
+}
+
+// 处理复选框状态变化 - 与特定公告ID和时间戳绑定
+function toggleHideNotice(noticeKey) {
+    const checkbox = document.getElementById('dontShowAgain');
+    if (checkbox.checked) {
+        localStorage.setItem(noticeKey, 'true');
+    } else {
+        localStorage.removeItem(noticeKey);
+    }
+}
+
+// 加载更多资源（无 JS 时按钮就是普通的下一页链接）
+function loadMore(e) {
+    e.preventDefault();
+    const button = e.currentTarget;
+    if (button.dataset.page) {
+        loadStaticPage(button);
+        return;
+    }
+    const grid = document.getElementById('resourceGrid');
+    const params = new URLSearchParams(window.location.search);
+    params.set('cursor', button.dataset.cursor);
+    params.set('partial', '1');
+
+    button.textContent = '加载中...';
+    fetch('/?' + params.toString())
+        .then(response => {
+            const nextCursor = response.headers.get('X-Next-Cursor');
+            return response.text().then(html => ({ html, nextCursor }));
+        })
+        .then(({ html, nextCursor }) => {
+            grid.insertAdjacentHTML('beforeend', html);
+            if (nextCursor) {
+                button.dataset.cursor = nextCursor;
+                button.textContent = '加载更多';
+            } else {
+                button.parentElement.remove();
+            }
+        })
+        .catch(error => {
+            console.error('Error:', error);
+            button.textContent = '加载失败，点击重试';
+        });
+}
+
+// 静态发布的页面：按页码加载预先生成的资源卡片片段
+function loadStaticPage(button) {
+    const grid = document.getElementById('resourceGrid');
+    const page = parseInt(button.dataset.page, 10);
+    const pages = parseInt(button.dataset.pages, 10);
+
+    button.textContent = '加载中...';
+    fetch('/page/' + page + '.part.html')
+        .then(response => {
+            if (!response.ok) {
+                throw new Error(response.status);
+            }
+            return response.text();
+        })
+        .then(html => {
+            grid.insertAdjacentHTML('beforeend', html);
+            if (page < pages) {
+                button.dataset.page = page + 1;
+                button.href = '/page/' + (page + 1) + '.html';
+                button.textContent = '加载更多';
+            } else {
+                button.parentElement.remove();
+            }
+        })
+        .catch(error => {
+            console.error('Error:', error);
+            button.textContent = '加载失败，点击重试';
+        });
+}
+
+// 按ESC键关闭公告
+document.addEventListener('keydown', function(e) {
+    if (e.key === 'Escape') {
+        closeNotice();
+    }
+});
+
+// 点击遮罩层关闭公告
+document.addEventListener('click', function(e) {
+    if (e.target.id === 'noticeOverlay') {
+        closeNotice();
+    }
+});
+
+// 页面加载时检查是否应该显示公告
+document.addEventListener('DOMContentLoaded', function() {
+    const noticeOverlay = document.getElementById('noticeOverlay');
+
+    // 如果有公告但用户选择不再显示，则移除
+    if (noticeOverlay && !shouldShowNotice()) {
+        noticeOverlay.remove();
+        return;
+    }
+
+    // 如果显示公告，禁止背景滚动
+    if (noticeOverlay) {
+        document.body.style.overflow = 'hidden';
+    }
+
+    // 检查本地存储中是否已经设置过不再显示当前公告
+    const noticeKey = getNoticeKey();
+    if (noticeKey && localStorage.getItem(noticeKey) === 'true') {
+        document.getElementById('dontShowAgain').checked = true;
+    }
+
+    const loadMoreBtn = document.getElementById('loadMore');
+    if (loadMoreBtn) {
+        loadMoreBtn.addEventListener('click', loadMore);
+    }
+
+    const searchInput = document.querySelector('.search-input');
+    if (searchInput) {
+        // ESC键清空搜索（如果没有公告弹窗的话）
+        searchInput.addEventListener('keydown', function(e) {
+            if (e.key === 'Escape' && !document.getElementById('noticeOverlay')) {
+                this.value = '';
+                this.blur();
+            }
+        });
+
+        // Ctrl+K 或 Cmd+K 快捷键聚焦搜索框
+        document.addEventListener('keydown', function(e) {
+            if ((e.ctrlKey || e.metaKey) && e.key === 'k') {
+                e.preventDefault();
+                searchInput.focus();
+                searchInput.select();
+            }
+        });
+    }
+});
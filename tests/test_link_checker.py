@@ -0,0 +1,201 @@
+"""链接检查测试：针对本地的桩 HTTP 服务运行，不访问外网
+
+运行：python -m unittest discover tests（或 python -m pytest tests）
+"""
+import asyncio
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as site
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """按路径返回不同的状态，并统计同时处理中的请求数"""
+
+    def log_message(self, *args):
+        pass
+
+    def respond(self):
+        server = self.server
+        with server.stats_lock:
+            server.stats['active'] += 1
+            server.stats['peak'] = max(server.stats['peak'], server.stats['active'])
+            server.stats['methods'].append((self.command, self.path))
+        try:
+            time.sleep(0.05)
+            if self.path.startswith('/ok'):
+                self.send_response(200)
+            elif self.path.startswith('/gone'):
+                self.send_response(404)
+            elif self.path.startswith('/redirect-gone'):
+                self.send_response(302)
+                self.send_header('Location', '/gone')
+            elif self.path.startswith('/redirect'):
+                self.send_response(301)
+                self.send_header('Location', '/ok')
+            elif self.path.startswith('/no-head') and self.command == 'HEAD':
+                self.send_response(405)
+            elif self.path.startswith('/no-head'):
+                self.send_response(200)
+            elif self.path.startswith('/slow'):
+                time.sleep(1.5)
+                self.send_response(200)
+            else:
+                self.send_response(500)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+        finally:
+            with server.stats_lock:
+                server.stats['active'] -= 1
+
+    do_HEAD = do_GET = respond
+
+
+def start_stub(host='127.0.0.1', stats=None, stats_lock=None):
+    server = ThreadingHTTPServer((host, 0), StubHandler)
+    server.daemon_threads = True
+    server.stats = stats if stats is not None else {'active': 0, 'peak': 0, 'methods': []}
+    server.stats_lock = stats_lock or threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class LinkCheckerTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = start_stub()
+        cls.base = f'http://127.0.0.1:{cls.server.server_port}'
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.server.stats.update(active=0, peak=0, methods=[])
+
+    def check(self, url, **options):
+        async def run():
+            return await site.LinkChecker(**options).check(url)
+        return asyncio.run(run())
+
+    def test_ok(self):
+        self.assertEqual(self.check(self.base + '/ok'), 'ok')
+        self.assertEqual(self.server.stats['methods'], [('HEAD', '/ok')])
+
+    def test_not_found_is_dead(self):
+        self.assertEqual(self.check(self.base + '/gone'), 'dead')
+
+    def test_head_falls_back_to_get(self):
+        self.assertEqual(self.check(self.base + '/no-head'), 'ok')
+        self.assertEqual(self.server.stats['methods'], [('HEAD', '/no-head'), ('GET', '/no-head')])
+
+    def test_follows_redirects(self):
+        self.assertEqual(self.check(self.base + '/redirect'), 'ok')
+        self.assertEqual(self.check(self.base + '/redirect-gone'), 'dead')
+
+    def test_server_error_is_error(self):
+        self.assertEqual(self.check(self.base + '/broken'), 'error')
+
+    def test_timeout_is_error(self):
+        started = time.monotonic()
+        self.assertEqual(self.check(self.base + '/slow', timeout=0.3), 'error')
+        self.assertLess(time.monotonic() - started, 1.2)
+
+    def test_unresolvable_host_is_dead(self):
+        error = socket.gaierror(socket.EAI_NONAME, 'Name or service not known')
+        with mock.patch('asyncio.open_connection', side_effect=error):
+            self.assertEqual(self.check('http://does-not-exist.example/file'), 'dead')
+
+    def test_temporary_dns_failure_is_error(self):
+        error = socket.gaierror(socket.EAI_AGAIN, 'Temporary failure in name resolution')
+        with mock.patch('asyncio.open_connection', side_effect=error):
+            self.assertEqual(self.check('http://example.com/file'), 'error')
+
+    def test_unsupported_scheme_is_error(self):
+        self.assertEqual(self.check('ftp://127.0.0.1/file'), 'error')
+
+    def test_per_host_limit(self):
+        rows = [{'id': i, 'pan_link': f'{self.base}/ok/{i}', 'tg_link': ''} for i in range(12)]
+
+        async def run():
+            return await site.LinkChecker(max_connections=20, per_host=2).check_resources(rows)
+
+        results = asyncio.run(run())
+        self.assertEqual([result[0] for result in results], ['ok'] * 12)
+        self.assertEqual(self.server.stats['peak'], 2)
+
+    def test_global_connection_limit(self):
+        # 三个主机共用一份统计：每主机上限 4，全局上限 3
+        stats, lock = {'active': 0, 'peak': 0, 'methods': []}, threading.Lock()
+        servers = [start_stub(f'127.0.0.{n}', stats, lock) for n in (1, 2, 3)]
+        try:
+            rows = [{'id': i, 'pan_link': f'http://127.0.0.{n}:{server.server_port}/ok/{i}', 'tg_link': ''}
+                    for i in range(4) for n, server in zip((1, 2, 3), servers)]
+
+            async def run():
+                return await site.LinkChecker(max_connections=3, per_host=4).check_resources(rows)
+
+            results = asyncio.run(run())
+        finally:
+            for server in servers:
+                server.shutdown()
+                server.server_close()
+        self.assertEqual([result[0] for result in results], ['ok'] * 12)
+        self.assertEqual(stats['peak'], 3)
+
+
+class RunLinkCheckTest(unittest.TestCase):
+    """run_link_check：挑选过期的资源、通过写队列保存结果"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = start_stub()
+        cls.base = f'http://127.0.0.1:{cls.server.server_port}'
+        cls.workdir = tempfile.mkdtemp(prefix='linkcheck_')
+        site.DATABASE = os.path.join(cls.workdir, 'resources.db')
+        site.db_pool = site.ConnectionPool(site.DATABASE)
+        site.PUBLISH_DIR = None
+        site.init_db()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        shutil.rmtree(cls.workdir, ignore_errors=True)
+
+    def test_saves_results_and_skips_fresh_rows(self):
+        ok = site.write_queue.run(site.add_resource, ('ok', '', '', self.base + '/ok', self.base + '/no-head', '', ''))
+        dead = site.write_queue.run(site.add_resource, ('dead', '', '', '', self.base + '/gone', '', ''))
+        empty = site.write_queue.run(site.add_resource, ('empty', '', '', '', '', '', ''))
+
+        self.assertEqual(site.run_link_check(), {'ok': 2, 'dead': 1})
+
+        db = site.db_pool.acquire()
+        try:
+            rows = {row['id']: row for row in db.execute('SELECT * FROM resources')}
+        finally:
+            site.db_pool.release(db)
+        self.assertEqual((rows[ok]['pan_link_status'], rows[ok]['tg_link_status']), ('ok', 'ok'))
+        self.assertEqual((rows[dead]['pan_link_status'], rows[dead]['tg_link_status']), ('dead', None))
+        self.assertIsNone(rows[empty]['link_checked_at'])
+        self.assertIsNotNone(rows[ok]['link_checked_at'])
+
+        # 结果仍在有效期内，不会重复检查；max_age=0 时全部重新检查
+        self.assertEqual(site.run_link_check(), {})
+        self.assertEqual(site.run_link_check(max_age=0), {'ok': 2, 'dead': 1})
+
+
+if __name__ == '__main__':
+    unittest.main()